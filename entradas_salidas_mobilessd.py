@@ -9,12 +9,37 @@ import subprocess
 import threading
 import time
 import sys
-import re
-from flask import Flask, jsonify, Response, render_template_string
+import gzip
+import hashlib
+import shutil
+import heapq
+import itertools
+import json
+import numpy as np
+from flask import Flask, jsonify, Response, request
 from datetime import datetime
-import psutil
 import os
 
+try:
+    import brotli  # Opcional: compresión br de la página principal
+except ImportError:
+    brotli = None
+
+try:
+    from waitress import serve as waitress_serve  # Opcional: servidor WSGI
+except ImportError:
+    waitress_serve = None
+
+try:
+    import orjson  # Opcional: serialización JSON más rápida para /status
+except ImportError:
+    orjson = None
+
+try:
+    from scipy.spatial import cKDTree  # Opcional: búsqueda del track más cercano
+except ImportError:
+    cKDTree = None
+
 # ==========================
 # Configuración
 # ==========================
@@ -26,24 +51,70 @@ CANVAS_HEIGHT = 480
 SCALE_X = CANVAS_WIDTH / SENSOR_WIDTH
 SCALE_Y = CANVAS_HEIGHT / SENSOR_HEIGHT
 
+WEB_PORT = 5000
+WEB_THREADS = 8  # Cada cliente de /video_feed ocupa un hilo mientras mira
+# Máximo de clientes de /video_feed a la vez: siempre quedan hilos libres
+# para /status y la página aunque haya muchos visores abiertos
+MAX_VIDEO_CLIENTS = WEB_THREADS - 2
+STATUS_CACHE_TTL = 0.1  # Segundos que se reutiliza el mismo cuerpo de /status
+
 STALE_TRACK_SEC = 2.0
+# Confianza mínima de una detección. El log la escribe como "0.NN", así que
+# comparar los bytes equivale a comparar el número
+MIN_CONFIDENCE = b"0.5"
 MAX_DIST_PX = 120
+MAX_DIST_SQ = MAX_DIST_PX * MAX_DIST_PX
+# Lado de la línea de conteo guardado en last_side_arr
+SIDE_UNKNOWN = 0
+SIDE_L = 1
+SIDE_R = 2
+# Máximo de tracks simultáneos. Los arreglos tienen este tamaño fijo: si se
+# llena, el track visto hace más tiempo se reemplaza por el nuevo, así que
+# n_tracks nunca supera MAX_TRACKS
+MAX_TRACKS = 128
+# Con scipy y al menos esta cantidad de tracks se busca con un cKDTree; con
+# menos, la pasada vectorizada de NumPy es más barata que armar el árbol
+KDTREE_MIN_TRACKS = 16
+KDTREE_EPS_PX = 8  # Movimiento de un track que obliga a reconstruir el árbol
+
+# Prefiltro del log de rpicam-vid: grep descarta en C las líneas que no son
+# delimitadores de frame ni detecciones, así Python solo lee las útiles
+STDERR_PREFILTER = True
+STDERR_PREFILTER_RE = r"Viewfinder frame|Number of objects detected:|\] : \w+\[[0-9]+\].*@"
+STDERR_READ_SIZE = 65536  # Bytes por lectura del log; se separa en líneas en Python
 
-DET_RE = re.compile(
-    r"\[(\d+)\]\s*:\s*(\w+)\[\d+\]\s*\(([\d.]+)\)\s*@\s*(\d+),(\d+)\s+(\d+)x(\d+)"
-)
 
 # ==========================
 # Estado global
 # ==========================
-tracks = {}
-next_id = 0
+# Estado de los tracks en arreglos paralelos (SoA); las primeras n_tracks
+# posiciones son válidas y no hay otra representación por track
+cx_arr = np.empty(MAX_TRACKS, dtype=np.int32)
+cy_arr = np.empty(MAX_TRACKS, dtype=np.int32)
+ids_arr = np.empty(MAX_TRACKS, dtype=np.int32)
+last_seen_arr = np.empty(MAX_TRACKS, dtype=np.float64)
+last_side_arr = np.empty(MAX_TRACKS, dtype=np.int8)
+n_tracks = 0
+# Árbol sobre las posiciones de los tracks; se reconstruye solo cuando
+# _tree_dirty indica altas, bajas o movimientos mayores a KDTREE_EPS_PX
+_tree = None
+_tree_dirty = True
+# Min-heap (last_seen, tid) con una entrada por actualización; las entradas
+# cuyo last_seen ya no coincide con el del track se descartan al salir.
+# _slot_por_id ubica cada tid en los arreglos
+_expire_heap = []
+_slot_por_id = {}
+_id_counter = itertools.count()  # next() es atómico: no requiere el lock
 total_in = 0
 total_out = 0
 personas_habitacion = 0  # Contador de personas en habitación
 last_update = time.time()
 lock = threading.Lock()
-latest_frame = None  # Para video feed
+latest_frame = None  # Parte MJPEG lista para enviar (cabecera + JPEG + cierre)
+# Avisa a los clientes de /video_feed que llegó un frame nuevo; _frame_seq
+# cuenta los frames publicados para que cada cliente sepa cuál envió
+_frame_cv = threading.Condition()
+_frame_seq = 0
 
 # Configuración de dirección del flujo
 FLOW_DIRECTION_NORMAL = (
@@ -53,83 +124,210 @@ FLOW_DIRECTION_NORMAL = (
 cpu_usage = 0.0
 ram_usage = 0.0
 cpu_temp = 0.0
+_cpu_prev = None  # (total, ocioso) en jiffies de la lectura anterior de /proc/stat
+
+# Último estado del tracking publicado por el hilo lector. Se reemplaza entero
+# (nunca se modifica), así /status lo lee sin tomar el lock
+STATUS_SNAPSHOT = {
+    "activos": 0,
+    "habitacion": 0,
+    "entradas": 0,
+    "salidas": 0,
+    "tracks_activos": {
+        "cx": np.empty(0, dtype=np.int32),
+        "cy": np.empty(0, dtype=np.int32),
+    },
+    "last_update": last_update,
+}
 
 
 # ==========================
 # Funciones de tracking
 # ==========================
+def _buscar_en_arbol(cx, cy, n):
+    """Posición del track más cercano según el cKDTree, o None (requiere lock)"""
+    global _tree, _tree_dirty
+    if _tree is None or _tree_dirty:
+        _tree = cKDTree(np.column_stack((cx_arr[:n], cy_arr[:n])))
+        _tree_dirty = False
+    # El árbol puede tener posiciones desfasadas hasta KDTREE_EPS_PX
+    _, i = _tree.query((cx, cy), k=1, distance_upper_bound=MAX_DIST_PX + KDTREE_EPS_PX)
+    if i == _tree.n:
+        return None
+    i = int(i)
+    dx = int(cx_arr[i]) - cx
+    dy = int(cy_arr[i]) - cy
+    if dx * dx + dy * dy > MAX_DIST_SQ:
+        return None
+    px, py = _tree.data[i]
+    if abs(cx - px) >= KDTREE_EPS_PX or abs(cy - py) >= KDTREE_EPS_PX:
+        _tree_dirty = True
+    return i
+
+
+def _asignar_id_locked(cx, cy, now):
+    """Asocia la detección al track más cercano o crea uno; devuelve su posición
+    (requiere lock). now es time.monotonic()"""
+    global n_tracks, _tree_dirty
+    n = n_tracks
+    # Arreglos en locales para el camino de coincidencia (el más frecuente)
+    cxs = cx_arr
+    cys = cy_arr
+    if cKDTree is not None and n >= KDTREE_MIN_TRACKS:
+        i = _buscar_en_arbol(cx, cy, n)
+        if i is not None:
+            cxs[i] = cx
+            cys[i] = cy
+            last_seen_arr[i] = now
+            heapq.heappush(_expire_heap, (now, int(ids_arr[i])))
+            return i
+    elif n:
+        # Distancia al cuadrado a todos los tracks en una sola pasada vectorizada
+        dx = cxs[:n] - cx
+        dy = cys[:n] - cy
+        d2 = dx * dx + dy * dy
+        i = int(d2.argmin())
+        if d2[i] <= MAX_DIST_SQ:
+            cxs[i] = cx
+            cys[i] = cy
+            last_seen_arr[i] = now
+            heapq.heappush(_expire_heap, (now, int(ids_arr[i])))
+            return i
+    tid = next(_id_counter)
+    if n < MAX_TRACKS:
+        n_tracks = n + 1
+    else:
+        # Lleno: se reemplaza el track visto hace más tiempo (sus entradas en
+        # el heap quedan huérfanas y se descartan al salir)
+        n = int(last_seen_arr.argmin())
+        del _slot_por_id[int(ids_arr[n])]
+    cx_arr[n] = cx
+    cy_arr[n] = cy
+    ids_arr[n] = tid
+    last_seen_arr[n] = now
+    last_side_arr[n] = SIDE_UNKNOWN
+    _slot_por_id[tid] = n
+    heapq.heappush(_expire_heap, (now, tid))
+    _tree_dirty = True
+    return n
+
+
 def asignar_id(cx, cy):
-    global next_id
-    best_tid = None
-    best_dist = float("inf")
-    now = time.time()
     with lock:
-        for tid, t in tracks.items():
-            dist = ((cx - t["cx"]) ** 2 + (cy - t["cy"]) ** 2) ** 0.5
-            if dist < best_dist and dist <= MAX_DIST_PX:
-                best_dist = dist
-                best_tid = tid
-        if best_tid is not None:
-            t = tracks[best_tid]
-            t["cx"] = cx
-            t["cy"] = cy
-            t["last_seen"] = now
-            return best_tid
-        tid = next_id
-        next_id += 1
-        tracks[tid] = {"cx": cx, "cy": cy, "last_side": "?", "last_seen": now}
-        return tid
+        return _asignar_id_locked(cx, cy, time.monotonic())
+
+
+def _limpiar_tracks_locked(now):
+    """Elimina los tracks sin detecciones recientes (requiere lock)"""
+    global n_tracks, _tree_dirty, _slot_por_id
+    # Solo se mira la cabeza del heap: sin expiraciones no hay trabajo
+    limite = now - STALE_TRACK_SEC
+    vencidos = []
+    heap = _expire_heap
+    heappop = heapq.heappop
+    slot_de = _slot_por_id.get
+    vistos = last_seen_arr
+    while heap and heap[0][0] < limite:
+        visto, tid = heappop(heap)
+        i = slot_de(tid)
+        if i is not None and vistos[i] == visto:
+            vencidos.append(i)
+    if not vencidos:
+        return
+    # Compactar los tracks vigentes al inicio de los arreglos
+    n = n_tracks
+    vivos = np.ones(n, dtype=bool)
+    vivos[vencidos] = False
+    nuevo = n - len(vencidos)
+    for arr in (cx_arr, cy_arr, ids_arr, last_seen_arr, last_side_arr):
+        arr[:nuevo] = arr[:n][vivos]
+    n_tracks = nuevo
+    _slot_por_id = {int(tid): i for i, tid in enumerate(ids_arr[:nuevo])}
+    _tree_dirty = True
 
 
 def limpiar_tracks():
-    now = time.time()
     with lock:
-        to_del = [
-            tid for tid, t in tracks.items() if now - t["last_seen"] > STALE_TRACK_SEC
-        ]
-        for tid in to_del:
-            del tracks[tid]
+        _limpiar_tracks_locked(time.monotonic())
+
+
+def parsear_deteccion(line):
+    """Extrae (etiqueta, conf, x, y, w, h) de una línea con el formato fijo
+    del log de rpicam-vid: "[N] : person[0] (0.73) @ x,y WxH".
+    etiqueta y conf quedan como bytes; devuelve None si la línea no tiene
+    ese formato"""
+    find = line.find
+    a = find(b"] : ")
+    if a < 0:
+        return None
+    a += 4
+    b = find(b"[", a)
+    c = find(b"(", b)
+    d = find(b")", c)
+    e = find(b"@", d)
+    f = find(b",", e)
+    g = find(b"x", f)
+    if b < 0 or c < 0 or d < 0 or e < 0 or f < 0 or g < 0:
+        return None
+    y_w = line[f + 1 : g].split()
+    resto = line[g + 1 :].split(None, 1)
+    if len(y_w) != 2 or not resto:
+        return None
+    try:
+        return (
+            line[a:b],
+            line[c + 1 : d].strip(),
+            int(line[e + 1 : f]),
+            int(y_w[0]),
+            int(y_w[1]),
+            int(resto[0]),
+        )
+    except ValueError:
+        return None
 
 
 def procesar_inferencia(line):
     """Procesa una línea de inferencia y actualiza los tracks y conteos"""
     global total_in, total_out, personas_habitacion, last_update
-    m = DET_RE.search(line)
-    if not m:
+    det = parsear_deteccion(line)
+    if det is None:
         return
 
-    label = m.group(2).lower()
-    conf = float(m.group(3))
-    x = int(m.group(4))
-    y = int(m.group(5))
-    w = int(m.group(6))
-    h = int(m.group(7))
-    if label != "person" or conf < 0.5:
+    label, conf, x, y, w, h = det
+    # conf se compara como texto, sin convertir a float (ver MIN_CONFIDENCE)
+    if conf < MIN_CONFIDENCE or label.lower() != b"person":
         return
 
     cx = x + w // 2
     cy = y + h // 2
-    tid = asignar_id(cx, cy)
     # La cámara está invertida horizontalmente, por eso invertimos la lógica
-    side = "L" if cx < LINE_X_SENSOR else "R"
+    side = SIDE_L if cx < LINE_X_SENSOR else SIDE_R
+
+    # Un solo reloj por detección; monotonic no salta con cambios de hora.
+    # time.time() queda solo para last_update, que se muestra al usuario
+    now = time.monotonic()
 
+    # Una sola sección crítica por detección: asignación, cruce, limpieza y
+    # publicación del estado
     with lock:
+        i = _asignar_id_locked(cx, cy, now)
+
         # Obtener el valor actual de la dirección del flujo de manera thread-safe
         current_flow_direction = FLOW_DIRECTION_NORMAL
 
-        last_side = tracks[tid]["last_side"]
-        if last_side != "?" and last_side != side:
+        last_side = last_side_arr[i]
+        if last_side != SIDE_UNKNOWN and last_side != side:
             # Determinar entrada/salida basado en la dirección del flujo
             if current_flow_direction:
                 # Dirección normal: L->R = Entrada, R->L = Salida
-                if last_side == "L" and side == "R":
+                if last_side == SIDE_L and side == SIDE_R:
                     total_in += 1
                     personas_habitacion += 1  # Incrementar personas en habitación
                     print(
                         f"🟢 ENTRADA detectada (L->R) - Total: {total_in}, En habitación: {personas_habitacion}",
                         file=sys.stderr,
                     )
-                elif last_side == "R" and side == "L":
+                elif last_side == SIDE_R and side == SIDE_L:
                     total_out += 1
                     personas_habitacion = max(
                         0, personas_habitacion - 1
@@ -140,7 +338,7 @@ def procesar_inferencia(line):
                     )
             else:
                 # Dirección invertida: L->R = Salida, R->L = Entrada
-                if last_side == "L" and side == "R":
+                if last_side == SIDE_L and side == SIDE_R:
                     total_out += 1
                     personas_habitacion = max(
                         0, personas_habitacion - 1
@@ -149,7 +347,7 @@ def procesar_inferencia(line):
                         f"🔴 SALIDA detectada (L->R) [INVERTIDA] - Total: {total_out}, En habitación: {personas_habitacion}",
                         file=sys.stderr,
                     )
-                elif last_side == "R" and side == "L":
+                elif last_side == SIDE_R and side == SIDE_L:
                     total_in += 1
                     personas_habitacion += 1  # Incrementar personas en habitación
                     print(
@@ -157,15 +355,39 @@ def procesar_inferencia(line):
                         file=sys.stderr,
                     )
             last_update = time.time()
-        tracks[tid]["last_side"] = side
-        tracks[tid]["last_seen"] = time.time()
+        last_side_arr[i] = side
+
+        # Con el heap de expiraciones el barrido solo cuesta los tracks
+        # vencidos, así que se hace en cada detección
+        _limpiar_tracks_locked(now)
+
+        _publicar_estado()
+
+
+def _publicar_estado():
+    """Publica un nuevo snapshot del tracking para /status (requiere lock)"""
+    global STATUS_SNAPSHOT
+    STATUS_SNAPSHOT = {
+        "activos": n_tracks,
+        "habitacion": personas_habitacion,
+        "entradas": total_in,
+        "salidas": total_out,
+        # Copias de las columnas (SoA): se serializan tal cual, sin un
+        # objeto por track
+        "tracks_activos": {
+            "cx": cx_arr[:n_tracks].copy(),
+            "cy": cy_arr[:n_tracks].copy(),
+        },
+        "last_update": last_update,
+    }
 
-    limpiar_tracks()
+
+_MJPEG_PART_HEADER = b"--frame\r\nContent-Type: image/jpeg\r\n\r\n"
 
 
 def procesar_video(frame_data):
     """Procesa frame JPEG de video"""
-    global latest_frame
+    global latest_frame, _frame_seq
 
     # Verificar que sea un frame JPEG válido
     if (
@@ -175,7 +397,12 @@ def procesar_video(frame_data):
         and frame_data.endswith(b"\xff\xd9")
     ):
 
-        latest_frame = frame_data
+        # Se arma la parte MJPEG una sola vez por frame, no una vez por cliente
+        parte = b"".join((_MJPEG_PART_HEADER, frame_data, b"\r\n"))
+        with _frame_cv:
+            latest_frame = parte
+            _frame_seq += 1
+            _frame_cv.notify_all()
         print(
             f"📹 Frame JPEG válido procesado: {len(frame_data)} bytes", file=sys.stderr
         )
@@ -186,6 +413,30 @@ def procesar_video(frame_data):
         )
 
 
+def _leer_lineas(stream):
+    """Itera las líneas (bytes con su \n) de un pipe leyendo bloques grandes
+    con os.read en lugar de una llamada a readline por línea"""
+    fd = stream.fileno()
+    leer = os.read
+    tam = STDERR_READ_SIZE
+    pendiente = b""
+    while True:
+        chunk = leer(fd, tam)
+        if not chunk:
+            break
+        datos = pendiente + chunk if pendiente else chunk
+        find = datos.find
+        inicio = 0
+        fin = find(b"\n")
+        while fin != -1:
+            yield datos[inicio : fin + 1]
+            inicio = fin + 1
+            fin = find(b"\n", inicio)
+        pendiente = datos[inicio:]
+    if pendiente:
+        yield pendiente
+
+
 def rpicam_hello_reader():
     global latest_frame
 
@@ -208,12 +459,24 @@ def rpicam_hello_reader():
     ]
 
     proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    inference_stream = proc.stderr
+
+    if STDERR_PREFILTER and shutil.which("grep"):
+        grep_proc = subprocess.Popen(
+            ["grep", "--line-buffered", "-E", STDERR_PREFILTER_RE],
+            stdin=proc.stderr,
+            stdout=subprocess.PIPE,
+        )
+        proc.stderr.close()  # grep queda como único lector del stderr
+        inference_stream = grep_proc.stdout
+        print("🔎 Prefiltro grep activo sobre stderr de rpicam-vid", file=sys.stderr)
 
     print("⏳ Iniciando procesamiento de frames e inferencias...", file=sys.stderr)
 
     # Procesar frames JPEG desde stdout
     def process_frames():
-        buffer = b""
+        # bytearray: se agrega y recorta en el lugar, sin recopiar todo el buffer
+        buffer = bytearray()
         print("📹 Iniciando captura de frames desde stdout...", file=sys.stderr)
 
         while True:
@@ -232,89 +495,85 @@ def rpicam_hello_reader():
                     if start_pos == -1:
                         # No hay inicio de frame, mantener solo el último byte por si es 0xFF
                         if buffer and buffer[-1] == 0xFF:
-                            buffer = buffer[-1:]
+                            del buffer[:-1]
                         else:
-                            buffer = b""
+                            buffer.clear()
                         break
 
                     # Buscar fin de frame JPEG (0xFF 0xD9) después del inicio
                     end_pos = buffer.find(b"\xff\xd9", start_pos + 2)
                     if end_pos == -1:
                         # No hay fin de frame, mantener desde el inicio
-                        buffer = buffer[start_pos:]
+                        del buffer[:start_pos]
                         break
 
-                    # Extraer frame completo
-                    frame_data = buffer[start_pos : end_pos + 2]
+                    # Extraer frame completo (una sola copia a bytes)
+                    with memoryview(buffer) as view:
+                        frame_data = bytes(view[start_pos : end_pos + 2])
                     if (
                         len(frame_data) > 1000
                     ):  # Verificar que el frame tenga un tamaño mínimo
                         procesar_video(frame_data)
 
                     # Remover frame procesado del buffer
-                    buffer = buffer[end_pos + 2 :]
+                    del buffer[: end_pos + 2]
 
             except Exception as e:
                 print(f"❌ Error en process_frames: {e}", file=sys.stderr)
                 time.sleep(0.1)
 
-    # Procesar inferencias desde stderr
+    # Procesar inferencias desde stderr (en bytes: el log es ASCII y
+    # parsear_deteccion trabaja directamente sobre bytes, sin decodificar)
     def process_inferences():
-        buffer_block = ""
+        # Líneas del bloque actual; se unen una sola vez al cerrarlo
+        buffer_block = []
         current_type = None
         print(
             "🔍 Iniciando procesamiento de inferencias desde stderr...", file=sys.stderr
         )
 
-        while True:
+        for line in _leer_lineas(inference_stream):
             try:
-                line = proc.stderr.readline()
-                if not line:
-                    break
-                line = line.decode("utf-8").strip()
+                # La línea se usa tal como llega (bytes con su \n): sin strip
+                # ni copias, las búsquedas de subcadenas no dependen de la sangría
 
                 # Detectar bloque de video
-                if line.startswith("Viewfinder frame"):
+                if b"Viewfinder frame" in line:
                     if buffer_block and current_type:
+                        bloque = b"".join(buffer_block)
                         if current_type == "video":
-                            procesar_video(buffer_block)
+                            procesar_video(bloque)
                         elif current_type == "inferencia":
-                            procesar_inferencia(buffer_block)
-                    buffer_block = line + "\n"
+                            procesar_inferencia(bloque)
+                    buffer_block = [line]
                     current_type = "video"
 
                 # Detectar bloque de inferencia
-                elif "Number of objects detected:" in line or line.startswith(
-                    "[0] : person"
-                ):
+                elif b"Number of objects detected:" in line or b"[0] : person" in line:
                     if buffer_block and current_type:
+                        bloque = b"".join(buffer_block)
                         if current_type == "video":
-                            procesar_video(buffer_block)
+                            procesar_video(bloque)
                         elif current_type == "inferencia":
-                            procesar_inferencia(buffer_block)
-                    buffer_block = line + "\n"
+                            procesar_inferencia(bloque)
+                    buffer_block = [line]
                     current_type = "inferencia"
 
                 # Acumular líneas de contexto
                 else:
-                    buffer_block += line + "\n"
+                    buffer_block.append(line)
 
             except Exception as e:
                 print(f"❌ Error en process_inferences: {e}", file=sys.stderr)
                 time.sleep(0.1)
 
-    # Ejecutar ambos procesadores en hilos separados
-    import threading
-
+    # Los frames van en un hilo aparte; las inferencias se procesan en este
+    # mismo hilo en lugar de dejarlo bloqueado esperando a los otros dos
     frame_thread = threading.Thread(target=process_frames, daemon=True)
-    inference_thread = threading.Thread(target=process_inferences, daemon=True)
-
     frame_thread.start()
-    inference_thread.start()
 
-    # Esperar a que ambos hilos terminen
+    process_inferences()
     frame_thread.join()
-    inference_thread.join()
 
 
 # ==========================
@@ -719,10 +978,13 @@ async function updateCanvasWithFrame() {
         }
 
         // Escalar tracks para el canvas
-        const scaledTracks = data.tracks_activos.map(t => {
+        // tracks_activos llega como columnas paralelas {cx: [...], cy: [...]}
+        const tracksCx = data.tracks_activos.cx;
+        const tracksCy = data.tracks_activos.cy;
+        const scaledTracks = tracksCx.map((cx, i) => {
             return {
-                cx: Math.round(t.cx * 640 / 2028),
-                cy: Math.round(t.cy * 480 / 1520)
+                cx: Math.round(cx * 640 / 2028),
+                cy: Math.round(tracksCy[i] * 480 / 1520)
             };
         });
 
@@ -831,31 +1093,84 @@ videoFeed.onload = () => {
 """
 
 
+# La página es estática: se comprime una sola vez al importar
+_HTML_BYTES = HTML_TEMPLATE.encode("utf-8")
+_HTML_GZ = gzip.compress(_HTML_BYTES, 9)
+_HTML_BR = brotli.compress(_HTML_BYTES) if brotli is not None else None
+_HTML_ETAG = '"%s"' % hashlib.sha1(_HTML_BYTES).hexdigest()[:16]
+
+
 @app.route("/")
 def index():
-    return render_template_string(HTML_TEMPLATE)
+    headers = {
+        "Cache-Control": "public, max-age=86400, immutable",
+        "ETag": _HTML_ETAG,
+        "Vary": "Accept-Encoding",
+    }
+    if _HTML_ETAG in request.headers.get("If-None-Match", ""):
+        return Response(status=304, headers=headers)
+
+    accept_encoding = request.headers.get("Accept-Encoding", "")
+    if _HTML_BR is not None and "br" in accept_encoding:
+        body = _HTML_BR
+        headers["Content-Encoding"] = "br"
+    elif "gzip" in accept_encoding:
+        body = _HTML_GZ
+        headers["Content-Encoding"] = "gzip"
+    else:
+        body = _HTML_BYTES
+    return Response(body, mimetype="text/html", headers=headers)
+
+
+# Cuerpo JSON de /status ya serializado, compartido por todos los clientes
+# durante STATUS_CACHE_TTL: (monotonic de creación, bytes)
+_status_cache = (float("-inf"), b"{}")
+_status_cache_lock = threading.Lock()
+
+
+def _invalidar_status_cache():
+    """Fuerza a regenerar /status en la próxima consulta (tras un cambio manual)"""
+    global _status_cache
+    _status_cache = (float("-inf"), b"{}")
+
+
+def _serializar_status():
+    snap = STATUS_SNAPSHOT
+    tracks = snap["tracks_activos"]
+    if orjson is None:
+        tracks = {"cx": tracks["cx"].tolist(), "cy": tracks["cy"].tolist()}
+    datos = {
+        "activos": snap["activos"],
+        "habitacion": snap["habitacion"],
+        "entradas": snap["entradas"],
+        "salidas": snap["salidas"],
+        "tracks_activos": tracks,
+        "cpu_usage": cpu_usage,
+        "ram_usage": ram_usage,
+        "cpu_temp": cpu_temp,
+        "flow_direction": "normal" if FLOW_DIRECTION_NORMAL else "inverted",
+        "ultima_actualizacion": datetime.fromtimestamp(
+            snap["last_update"]
+        ).strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    if orjson is not None:
+        return orjson.dumps(datos, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(datos, separators=(",", ":")).encode()
 
 
 @app.route("/status")
 def status():
-    with lock:
-        tracks_pos = [{"cx": t["cx"], "cy": t["cy"]} for t in tracks.values()]
-        return jsonify(
-            {
-                "activos": len(tracks),
-                "habitacion": personas_habitacion,
-                "entradas": total_in,
-                "salidas": total_out,
-                "tracks_activos": tracks_pos,
-                "cpu_usage": cpu_usage,
-                "ram_usage": ram_usage,
-                "cpu_temp": cpu_temp,
-                "flow_direction": "normal" if FLOW_DIRECTION_NORMAL else "inverted",
-                "ultima_actualizacion": datetime.fromtimestamp(last_update).strftime(
-                    "%Y-%m-%d %H:%M:%S"
-                ),
-            }
-        )
+    global _status_cache
+    now = time.monotonic()
+    creado, body = _status_cache
+    if now - creado > STATUS_CACHE_TTL:
+        with _status_cache_lock:
+            # Otro hilo pudo haberlo regenerado mientras se esperaba el lock
+            creado, body = _status_cache
+            if now - creado > STATUS_CACHE_TTL:
+                body = _serializar_status()
+                _status_cache = (now, body)
+    return Response(body, mimetype="application/json")
 
 
 @app.route("/toggle_flow_direction")
@@ -863,6 +1178,7 @@ def toggle_flow_direction():
     global FLOW_DIRECTION_NORMAL
     old_direction = "normal" if FLOW_DIRECTION_NORMAL else "invertida"
     FLOW_DIRECTION_NORMAL = not FLOW_DIRECTION_NORMAL
+    _invalidar_status_cache()
     new_direction = "normal" if FLOW_DIRECTION_NORMAL else "invertida"
 
     print(
@@ -878,73 +1194,150 @@ def toggle_flow_direction():
 
 @app.route("/reset_stats")
 def reset_stats():
-    global total_in, total_out, personas_habitacion, tracks, next_id
+    global total_in, total_out, personas_habitacion, n_tracks, _id_counter
+    global _tree_dirty, _expire_heap, _slot_por_id
     with lock:
         total_in = 0
         total_out = 0
         personas_habitacion = 0
-        tracks = {}
-        next_id = 0
+        n_tracks = 0
+        _tree_dirty = True
+        _expire_heap = []
+        _slot_por_id = {}
+        _id_counter = itertools.count()
+        _publicar_estado()
+        _invalidar_status_cache()
         print("🔄 Estadísticas reiniciadas", file=sys.stderr)
 
     return jsonify({"success": True, "message": "Estadísticas reiniciadas"})
 
 
 def generate_video():
-    global latest_frame
+    ultimo_seq = -1
     while True:
         try:
-            if latest_frame is None:
-                time.sleep(0.01)
-                continue
-
-            with lock:
+            # Bloquea hasta que haya un frame que este cliente no envió; sin
+            # frames nuevos no hay despertares ni reenvíos del mismo frame
+            with _frame_cv:
+                if not _frame_cv.wait_for(
+                    lambda: latest_frame is not None and _frame_seq != ultimo_seq,
+                    timeout=1.0,
+                ):
+                    continue
+                # procesar_video ya validó el JPEG y armó la parte completa
                 frame = latest_frame
+                ultimo_seq = _frame_seq
 
-            # Verificar que frame sea bytes válidos
-            if not isinstance(frame, bytes) or len(frame) < 100:
-                time.sleep(0.01)
-                continue
-
-            # Verificar que sea un JPEG válido
-            if not frame.startswith(b"\xff\xd8") or not frame.endswith(b"\xff\xd9"):
-                time.sleep(0.01)
-                continue
-
-            yield (b"--frame\r\n" b"Content-Type: image/jpeg\r\n\r\n" + frame + b"\r\n")
-            time.sleep(0.03)  # ~30 FPS
+            yield frame
 
         except Exception as e:
             print(f"❌ Error en generate_video: {e}", file=sys.stderr)
             time.sleep(0.1)
 
 
+_video_slots = threading.BoundedSemaphore(MAX_VIDEO_CLIENTS)
+
+
 @app.route("/video_feed")
 def video_feed():
+    if not _video_slots.acquire(blocking=False):
+        return "Demasiados clientes de video", 503
     try:
-        return Response(
+        response = Response(
             generate_video(), mimetype="multipart/x-mixed-replace; boundary=frame"
         )
+        # El servidor cierra la respuesta cuando el cliente se desconecta
+        response.call_on_close(_video_slots.release)
+        return response
     except Exception as e:
+        _video_slots.release()
         print(f"❌ Error en video_feed: {e}", file=sys.stderr)
         return "Error en video feed", 500
 
 
 def start_web():
-    print("🌐 Iniciando servidor web en http://0.0.0.0:5000", file=sys.stderr)
-    app.run(host="0.0.0.0", port=5000, debug=False, threaded=True)
+    print(f"🌐 Iniciando servidor web en http://0.0.0.0:{WEB_PORT}", file=sys.stderr)
+    if waitress_serve is not None:
+        # Detrás de nginx, usar proxy_buffering off en /video_feed
+        waitress_serve(app, host="0.0.0.0", port=WEB_PORT, threads=WEB_THREADS)
+    else:
+        print(
+            "⚠️ waitress no instalado, usando el servidor de desarrollo de Flask",
+            file=sys.stderr,
+        )
+        app.run(host="0.0.0.0", port=WEB_PORT, debug=False, threaded=True)
+
+
+def _abrir_fd(ruta):
+    """Abre un archivo de /proc o /sys una sola vez; None si no existe"""
+    try:
+        return os.open(ruta, os.O_RDONLY)
+    except OSError:
+        return None
+
+
+# Descriptores abiertos al inicio y leídos con pread en cada tick, sin
+# stat/open/close por segundo
+_STAT_FD = _abrir_fd("/proc/stat")
+_MEMINFO_FD = _abrir_fd("/proc/meminfo")
+_TEMP_FD = _abrir_fd("/sys/class/thermal/thermal_zone0/temp")
+
+
+def _leer_cpu_percent():
+    """Uso de CPU desde la lectura anterior, a partir de /proc/stat"""
+    global _cpu_prev
+    if _STAT_FD is None:
+        return 0.0
+    # cpu user nice system idle iowait irq softirq steal
+    primera = os.pread(_STAT_FD, 256, 0).split(b"\n", 1)[0]
+    valores = [int(v) for v in primera.split()[1:9]]
+    total = sum(valores)
+    ocioso = valores[3] + valores[4]
+    prev = _cpu_prev
+    _cpu_prev = (total, ocioso)
+    if prev is None or total == prev[0]:
+        return 0.0
+    return (1.0 - (ocioso - prev[1]) / (total - prev[0])) * 100.0
+
+
+_CAMPOS_MEMINFO = (b"MemTotal", b"MemFree", b"MemAvailable", b"Buffers", b"Cached")
+
+
+def _leer_ram_percent():
+    """Porcentaje de RAM en uso a partir de MemTotal/MemAvailable. Sin
+    MemAvailable (kernels anteriores a 3.14) se estima con MemFree + Buffers +
+    Cached; 0.0 si no hay MemTotal"""
+    if _MEMINFO_FD is None:
+        return 0.0
+    campos = {}
+    # Los campos usados están en las primeras líneas de /proc/meminfo
+    for linea in os.pread(_MEMINFO_FD, 512, 0).split(b"\n"):
+        nombre, _, resto = linea.partition(b":")
+        if nombre in _CAMPOS_MEMINFO:
+            campos[nombre] = int(resto.split()[0])
+    total = campos.get(b"MemTotal")
+    if not total:
+        return 0.0
+    disponible = campos.get(b"MemAvailable")
+    if disponible is None:
+        disponible = campos.get(b"MemFree", 0) + campos.get(b"Buffers", 0) + campos.get(b"Cached", 0)
+    return (1.0 - disponible / total) * 100.0
+
+
+def _leer_temperatura():
+    """Temperatura de la CPU en °C (Raspberry Pi); 0.0 si no hay sensor"""
+    if _TEMP_FD is None:
+        return 0.0
+    return float(os.pread(_TEMP_FD, 16, 0).strip()) / 1000.0
 
 
 def actualizar_metricas():
     global cpu_usage, ram_usage, cpu_temp
     while True:
         try:
-            cpu_usage = psutil.cpu_percent(interval=None)
-            ram_usage = psutil.virtual_memory().percent
-            # Lectura de temperatura en Raspberry Pi
-            if os.path.exists("/sys/class/thermal/thermal_zone0/temp"):
-                with open("/sys/class/thermal/thermal_zone0/temp", "r") as f:
-                    cpu_temp = float(f.read().strip()) / 1000.0
+            cpu_usage = _leer_cpu_percent()
+            ram_usage = _leer_ram_percent()
+            cpu_temp = _leer_temperatura()
             time.sleep(1)
         except Exception as e:
             print(f"⚠️ Error actualizando métricas: {e}", file=sys.stderr)
@@ -965,13 +1358,10 @@ def main():
     t_web.start()
     print("🌐 Hilo del servidor web iniciado", file=sys.stderr)
 
-    t_metrics = threading.Thread(target=actualizar_metricas, daemon=True)
-    t_metrics.start()
-    print("📊 Hilo de métricas iniciado", file=sys.stderr)
-
+    # El hilo principal solo esperaba: ahora actualiza las métricas cada segundo
+    print("📊 Métricas actualizándose en el hilo principal", file=sys.stderr)
     try:
-        while True:
-            time.sleep(1)
+        actualizar_metricas()
     except KeyboardInterrupt:
         print("\n🛑 Interrumpido por el usuario.", file=sys.stderr)
 
@@ -7,35 +7,246 @@ import json
 import os
 from typing import List, Tuple, Optional, Callable
 import queue
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 from collections import deque
 import logging
 
+try:
+    import numba
+except ImportError:
+    numba = None
+
+try:
+    from picamera2 import Picamera2
+except ImportError:
+    Picamera2 = None
+
+try:
+    from picamera2.devices import IMX500
+except ImportError:
+    IMX500 = None
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Cascada LBP de rostros: usa comparaciones de 8 bits en lugar de las sumas
+# sobre la imagen integral de Haar (2-4x más rápida). No viene en los wheels
+# de pip, así que se busca también en las rutas de OpenCV del sistema
+LBP_CASCADE_NAME = 'lbpcascade_frontalface_improved.xml'
+LBP_CASCADE_DIRS = [
+    '/usr/share/opencv4/lbpcascades',
+    '/usr/share/opencv/lbpcascades',
+    '/usr/local/share/opencv4/lbpcascades',
+]
+
+# Detector YuNet (CNN cuantizado, cv2.FaceDetectorYN, OpenCV >= 4.5.4): se
+# prefiere a las cascadas si el modelo ONNX está instalado
+YUNET_MODEL_NAME = 'face_detection_yunet_2023mar.onnx'
+YUNET_MODEL_DIRS = [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'),
+    '/usr/share/opencv4/models',
+    '/usr/local/share/opencv4/models',
+]
+YUNET_SCORE_THRESHOLD = 0.6
+
+# La detección corre sobre una copia gris reducida del frame (4x menos píxeles
+# a 0.5); los rectángulos se reescalan a la resolución original
+DETECTION_SCALE = 0.5
+
+# Tamaño máximo de rostro en píxeles del frame original (a 640x480 y a la
+# distancia de la puerta no aparecen más grandes): poda los niveles más
+# gruesos de la pirámide de escalas de la cascada
+MAX_FACE_SIZE = 240
+
+# Hilos que analizan frames en paralelo (OpenCV libera el GIL en sus llamadas)
+DETECTION_WORKERS = 3
+
+# Modelo .rpk de rostros para el acelerador del IMX500. Debe tener tres salidas:
+# cajas (N, 4), puntajes (N,) y embeddings (N, D). Sin modelo, la detección y
+# los embeddings se calculan en la CPU
+IMX500_FACE_MODEL = os.environ.get('IMX500_FACE_MODEL')
+SENSOR_MIN_SCORE = 0.5
+
+# Embedding simulado: STAT_FEATURES estadísticas seguidas de píxeles leídos
+# en las posiciones (k % alto, k % ancho) para k en _FILL_IDX
+EMBEDDING_SIZE = 128
+STAT_FEATURES = 9
+_FILL_IDX = np.arange(STAT_FEATURES, EMBEDDING_SIZE)
+_INV_255 = np.float32(1.0 / 255.0)
+
+# Filtro de movimiento: miniatura gris del frame y cambio medio por píxel
+# (0-255) por debajo del cual el frame no se vuelve a analizar
+MOTION_THUMB_SIZE = (80, 60)
+MOTION_THRESHOLD = 2.0
+
+# Peso de cada frame nuevo en la media móvil exponencial del intervalo (FPS)
+FPS_EMA_ALPHA = 0.05
+
+# Reparto de núcleos en la Pi 4 (4 núcleos): captura en el 0, detección en el
+# 2 y el 3, el 1 queda para la web. OpenCV limita su paralelismo interno a 2
+# hilos para no competir con los hilos propios por la caché L2
+OPENCV_THREADS = 2
+CAPTURE_CPUS = {0}
+DETECTION_CPUS = {2, 3}
+
+cv2.setNumThreads(OPENCV_THREADS)
+
+# Detectores ya cargados, por hilo y por archivo: cada cascada/modelo se
+# parsea una sola vez por hilo y lo comparten todos los handlers de ese hilo
+# (un detector nunca se usa desde dos hilos a la vez)
+_detector_cache = threading.local()
+
+def _pin_current_thread(cpus):
+    """Fija el hilo actual a los núcleos indicados que existan (solo Linux)"""
+    if not hasattr(os, 'sched_setaffinity'):
+        return
+    try:
+        cpus = set(cpus) & os.sched_getaffinity(0)
+        if cpus:
+            os.sched_setaffinity(0, cpus)
+    except OSError as e:
+        logger.debug(f"No se pudo fijar la afinidad de CPU: {e}")
+
+def _embed_kernel(face: np.ndarray, face_gray: np.ndarray) -> np.ndarray:
+    """
+    Embedding simulado completo en un solo recorrido de bucles explícitos.
+    Con numba se compila a código nativo (NEON en la Raspberry Pi); da el
+    mismo resultado que la versión con OpenCV de _simulate_camera_embedding
+    """
+    h, w = face.shape
+    n = h * w
+    
+    # Sobel 3x3 con borde reflejado (BORDER_REFLECT_101, como cv2.Sobel)
+    mag = np.empty((h, w), dtype=np.float32)
+    for i in range(h):
+        im = i - 1 if i > 0 else 1
+        ip = i + 1 if i < h - 1 else h - 2
+        for j in range(w):
+            jm = j - 1 if j > 0 else 1
+            jp = j + 1 if j < w - 1 else w - 2
+            gx = (face[im, jp] + 2.0 * face[i, jp] + face[ip, jp]
+                  - face[im, jm] - 2.0 * face[i, jm] - face[ip, jm])
+            gy = (face[ip, jm] + 2.0 * face[ip, j] + face[ip, jp]
+                  - face[im, jm] - 2.0 * face[im, j] - face[im, jp])
+            mag[i, j] = np.sqrt(gx * gx + gy * gy)
+    
+    # Cuartiles por histograma de 256 niveles y densidad de píxeles claros
+    hist = np.zeros(256, dtype=np.int64)
+    dense = 0
+    for i in range(h):
+        for j in range(w):
+            hist[face_gray[i, j]] += 1
+            if face[i, j] > 0.5:
+                dense += 1
+    q25 = -1
+    q75 = -1
+    cum = 0
+    for k in range(256):
+        cum += hist[k]
+        if q25 < 0 and cum >= 0.25 * n:
+            q25 = k
+        if cum >= 0.75 * n:
+            q75 = k
+            break
+    
+    emb = np.empty(128, dtype=np.float32)
+    emb[0] = mag.mean()
+    emb[1] = mag.std()
+    emb[2] = mag.max()
+    emb[3] = face.mean()
+    emb[4] = face.std()
+    emb[5] = q25 / 255.0
+    emb[6] = q75 / 255.0
+    emb[7] = h / w
+    emb[8] = dense / n
+    
+    # Relleno posicional y normalización L2
+    for k in range(9, 128):
+        emb[k] = face[k % h, k % w]
+    norm = 0.0
+    for k in range(128):
+        norm += emb[k] * emb[k]
+    norm = np.sqrt(norm) + 1e-8
+    for k in range(128):
+        emb[k] = emb[k] / norm
+    return emb
+
+def _confidence_kernel(face_gray: np.ndarray, roi_area: float) -> float:
+    """
+    Confianza de detección a partir de brillo y contraste del rostro gris
+    (media y desvío en un solo recorrido) y del área del ROI. Misma fórmula
+    que _calculate_detection_confidence
+    """
+    h, w = face_gray.shape
+    total = 0.0
+    total_sq = 0.0
+    for i in range(h):
+        for j in range(w):
+            v = float(face_gray[i, j])
+            total += v
+            total_sq += v * v
+    n = h * w
+    brightness = total / n
+    contrast = np.sqrt(max(total_sq / n - brightness * brightness, 0.0))
+    
+    size_score = min(roi_area / 10000.0, 1.0)
+    confidence = (contrast / 100.0 * 0.4 +
+                  (1.0 - abs(brightness - 128.0) / 128.0) * 0.3 +
+                  size_score * 0.3)
+    return max(0.1, min(1.0, confidence))
+
+if numba is not None:
+    _embed_kernel = numba.njit(cache=True, fastmath=True)(_embed_kernel)
+    _confidence_kernel = numba.njit(cache=True, fastmath=True)(_confidence_kernel)
+    # Compilar al importar para que el primer rostro no pague el JIT
+    _embed_kernel(np.zeros((128, 128), dtype=np.float32), np.zeros((128, 128), dtype=np.uint8))
+    _confidence_kernel(np.zeros((128, 128), dtype=np.uint8), 1.0)
+
 class IMX500CameraHandler:
     """
     Manejador de cámara IMX500 que simula la generación de embeddings
     en la cámara como requieren las reglas del sistema
     """
     
-    def __init__(self, camera_index: int = 0, frame_width: int = 640, frame_height: int = 480):
+    def __init__(self, camera_index: int = 0, frame_width: int = 640, frame_height: int = 480,
+                 imx500_model: Optional[str] = IMX500_FACE_MODEL):
         self.camera_index = camera_index
+        self.imx500_model = imx500_model
         self.frame_width = frame_width
         self.frame_height = frame_height
         self.is_running = False
         self.current_frame = None
         self.face_detector = None
+        self.face_detector_path = None
+        self.face_detector_kind = None  # 'yunet' o 'cascade'
         self.recognition_callback = None
         
-        # Colas para comunicación entre hilos
-        self.frame_queue = queue.Queue(maxsize=10)
+        # Comunicación entre hilos. Captura -> procesamiento: un único slot
+        # "último frame" (gana el más reciente, sin cola que se atrase)
+        self._latest_idx = None
+        self._latest_cv = threading.Condition()
         self.recognition_queue = queue.Queue(maxsize=20)
         
+        # Buffer circular de frames preasignados; entre hilos solo viajan
+        # índices de slot. Un slot para el frame actual, uno para el que espera
+        # al procesamiento, uno por cada frame en análisis en el pool y uno
+        # para la próxima captura
+        self._ring_size = DETECTION_WORKERS + 3
+        self._current_idx = None
+        self._busy_slots = set()  # Slots que está usando el procesamiento
+        self._frame_slots = [
+            np.empty((frame_height, frame_width, 3), dtype=np.uint8)
+            for _ in range(self._ring_size)
+        ]
+        self._slot_counter = itertools.count()
+        # Rostros que entregó el IMX500 junto con el frame de cada slot
+        self._slot_faces = [None] * self._ring_size
+        
         # Estadísticas
-        self.fps_counter = deque(maxlen=30)
-        self.last_fps_time = time.time()
+        self._ema_dt = 1.0 / 30.0  # Media móvil exponencial del intervalo entre frames
+        self.last_fps_time = time.monotonic()
         self.current_fps = 0
         
         # Estado de la cámara
@@ -44,9 +255,37 @@ class IMX500CameraHandler:
         self.reconnection_attempts = 0
         self.max_reconnection_attempts = 5
         self.reconnection_backoff = [0.5, 1.0, 2.0, 4.0, 8.0]
+        # Reconexión pendiente: instante (monotónico) del próximo intento. La
+        # espera se hace sobre _stop_event para que stop() la corte al instante
+        self._retry_at = None
+        self._stop_event = threading.Event()
+        # Diccionario de estado reutilizado por get_camera_status
+        self._status_dict = {}
         
-        # Proceso de cámara
+        # Proceso de cámara: rpicam-vid persistente que entrega YUV420 crudo
+        # por stdout (sin picamera2)
         self.camera_process = None
+        self._yuv_buffer = np.empty((frame_height * 3 // 2, frame_width), dtype=np.uint8)
+        self._stream_frame = np.empty((frame_height, frame_width, 3), dtype=np.uint8)
+        
+        # Stream persistente de picamera2 (si está instalado); sin él se
+        # lee el stream de rpicam-vid y, en último caso, rpicam-still
+        self.picam2 = None
+        self.imx500 = None
+        self._sensor_faces = None
+        
+        # Pool de análisis de frames (se crea en start) y detector por hilo
+        self._detection_pool = None
+        self._worker_local = threading.local()
+        
+        # Miniatura del último frame analizado (filtro de movimiento) y
+        # rostros del último resultado publicado, que se repiten en los
+        # frames sin cambios
+        self._prev_small = None
+        self._last_face_data = None
+        
+        # OpenCL (T-API) para la detección, si el sistema lo ofrece
+        self.use_opencl = self._init_opencl()
         
         # Inicializar detector de rostros como fallback
         self._init_face_detector()
@@ -54,17 +293,39 @@ class IMX500CameraHandler:
         # Inicializar cámara
         self._init_camera()
     
+    def _init_opencl(self) -> bool:
+        """Activa el T-API de OpenCV si hay un dispositivo OpenCL disponible"""
+        try:
+            if cv2.ocl.haveOpenCL():
+                cv2.ocl.setUseOpenCL(True)
+                if cv2.ocl.useOpenCL():
+                    logger.info("OpenCL disponible: la detección usará cv2.UMat")
+                    return True
+        except Exception as e:
+            logger.warning(f"No se pudo activar OpenCL: {e}")
+        return False
+    
     def _init_face_detector(self):
-        """Inicializa el detector de rostros de OpenCV como fallback"""
+        """Inicializa el detector de rostros de OpenCV como fallback (YuNet si
+        está el modelo, si no cascada LBP y en último caso Haar)"""
         try:
+            if self._init_yunet_detector():
+                return
+            
+            self.face_detector_kind = 'cascade'
+            if self._init_lbp_detector():
+                return
+            
             cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-            self.face_detector = cv2.CascadeClassifier(cascade_path)
+            self.face_detector = self._load_detector(cascade_path)
             
             if self.face_detector.empty():
                 logger.warning("No se pudo cargar el detector de rostros Haar")
-                self.face_detector = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_alt2.xml')
+                cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_alt2.xml'
+                self.face_detector = self._load_detector(cascade_path)
                 
             if not self.face_detector.empty():
+                self.face_detector_path = cascade_path
                 logger.info("Detector de rostros Haar inicializado correctamente")
             else:
                 logger.error("No se pudo inicializar ningún detector de rostros")
@@ -73,8 +334,77 @@ class IMX500CameraHandler:
             logger.error(f"Error al inicializar detector de rostros: {e}")
             self.face_detector = None
     
+    def _init_yunet_detector(self) -> bool:
+        """Intenta cargar YuNet; devuelve True si quedó inicializado"""
+        if not hasattr(cv2, 'FaceDetectorYN'):
+            return False
+        
+        for directory in YUNET_MODEL_DIRS:
+            model_path = os.path.join(directory, YUNET_MODEL_NAME)
+            if not os.path.exists(model_path):
+                continue
+            self.face_detector_kind = 'yunet'
+            try:
+                self.face_detector = self._load_detector(model_path)
+            except Exception as e:
+                # Por ejemplo OpenCV 4.5.4-4.7: tiene FaceDetectorYN pero no
+                # carga el modelo 2023mar. Se sigue con las cascadas
+                logger.warning(f"No se pudo cargar YuNet desde {model_path}, se usan cascadas: {e}")
+                self.face_detector_kind = None
+                self.face_detector = None
+                return False
+            self.face_detector_path = model_path
+            logger.info(f"Detector de rostros YuNet inicializado correctamente ({model_path})")
+            return True
+        
+        return False
+    
+    def _load_detector(self, path: str):
+        """Detector del tipo activo para el hilo actual; se carga del archivo
+        solo la primera vez que el hilo lo pide"""
+        detectors = getattr(_detector_cache, 'detectors', None)
+        if detectors is None:
+            detectors = _detector_cache.detectors = {}
+        
+        key = (self.face_detector_kind, path)
+        detector = detectors.get(key)
+        if detector is None:
+            if self.face_detector_kind == 'yunet':
+                size = (int(self.frame_width * DETECTION_SCALE), int(self.frame_height * DETECTION_SCALE))
+                detector = cv2.FaceDetectorYN.create(path, '', size, YUNET_SCORE_THRESHOLD)
+            else:
+                detector = cv2.CascadeClassifier(path)
+                if detector.empty():
+                    return detector
+            detectors[key] = detector
+        return detector
+    
+    def _init_lbp_detector(self) -> bool:
+        """Intenta cargar la cascada LBP; devuelve True si quedó inicializada"""
+        directories = list(LBP_CASCADE_DIRS)
+        cv2_data = getattr(cv2, 'data', None)
+        if cv2_data is not None:
+            directories.insert(0, cv2_data.haarcascades)
+        
+        for directory in directories:
+            lbp_path = os.path.join(directory, LBP_CASCADE_NAME)
+            if not os.path.exists(lbp_path):
+                continue
+            detector = self._load_detector(lbp_path)
+            if not detector.empty():
+                self.face_detector = detector
+                self.face_detector_path = lbp_path
+                logger.info(f"Detector de rostros LBP inicializado correctamente ({lbp_path})")
+                return True
+        
+        logger.info("Cascada LBP no disponible, usando detector Haar")
+        return False
+    
     def _init_camera(self):
         """Inicializa la cámara IMX500"""
+        if Picamera2 is not None and self._init_picamera2():
+            return
+        
         try:
             # Verificar que la cámara esté disponible
             result = subprocess.run(['rpicam-hello', '--list-cameras'], 
@@ -82,6 +412,7 @@ class IMX500CameraHandler:
             
             if 'imx500' in result.stdout:
                 logger.info("Cámara IMX500 detectada")
+                self._start_rpicam_stream()
                 self.camera_status = "READY"
             else:
                 logger.error("Cámara IMX500 no encontrada")
@@ -93,6 +424,92 @@ class IMX500CameraHandler:
             self.camera_status = "ERROR"
             self.last_error = str(e)
     
+    def _init_picamera2(self) -> bool:
+        """
+        Abre la cámara con picamera2 y deja el stream de video corriendo:
+        capture_array entrega cada frame como array sin fork, JPEG ni disco
+        """
+        try:
+            self._close_picamera2()
+            
+            # El firmware del modelo se carga antes de abrir la cámara
+            camera_index = self.camera_index
+            if self.imx500_model and IMX500 is not None and self.imx500 is None:
+                self.imx500 = IMX500(self.imx500_model)
+                logger.info(f"Modelo de rostros cargado en el IMX500: {self.imx500_model}")
+            if self.imx500 is not None:
+                camera_index = self.imx500.camera_num
+            
+            picam2 = Picamera2(camera_index)
+            # RGB888 de libcamera es BGR en memoria, el orden que usa OpenCV
+            config = picam2.create_video_configuration(
+                main={"size": (self.frame_width, self.frame_height), "format": "RGB888"}
+            )
+            picam2.configure(config)
+            picam2.start()
+            
+            self.picam2 = picam2
+            logger.info("Cámara IMX500 abierta con picamera2")
+            self.camera_status = "READY"
+            return True
+            
+        except Exception as e:
+            logger.warning(f"No se pudo abrir la cámara con picamera2, se usa el stream de rpicam-vid: {e}")
+            self._close_picamera2()
+            return False
+    
+    def _close_picamera2(self):
+        """Detiene y libera el stream de picamera2, si hay uno abierto"""
+        if self.picam2 is None:
+            return
+        try:
+            self.picam2.stop()
+            self.picam2.close()
+        except Exception as e:
+            logger.warning(f"Error al cerrar picamera2: {e}")
+        self.picam2 = None
+    
+    def _start_rpicam_stream(self) -> bool:
+        """
+        Lanza rpicam-vid una sola vez con salida YUV420 por stdout: el sensor
+        se inicializa y converge la exposición una vez por sesión, no por frame
+        """
+        self._stop_rpicam_stream()
+        try:
+            cmd = [
+                'rpicam-vid',
+                '--camera', str(self.camera_index),
+                '--codec', 'yuv420',
+                '--width', str(self.frame_width),
+                '--height', str(self.frame_height),
+                '--framerate', '30',
+                '--timeout', '0',
+                '--nopreview',
+                '--output', '-'
+            ]
+            self.camera_process = subprocess.Popen(
+                cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0
+            )
+            logger.info("Stream de rpicam-vid iniciado")
+            return True
+            
+        except Exception as e:
+            logger.warning(f"No se pudo iniciar rpicam-vid, se usa rpicam-still: {e}")
+            self.camera_process = None
+            return False
+    
+    def _stop_rpicam_stream(self):
+        """Termina el proceso de rpicam-vid, si hay uno corriendo"""
+        if self.camera_process is None:
+            return
+        if self.camera_process.poll() is None:
+            self.camera_process.terminate()
+            try:
+                self.camera_process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.camera_process.kill()
+        self.camera_process = None
+    
     def start(self):
         """Inicia la captura de video desde la cámara IMX500"""
         try:
@@ -101,6 +518,11 @@ class IMX500CameraHandler:
                 return False
             
             self.is_running = True
+            self._stop_event.clear()
+            self._detection_pool = ThreadPoolExecutor(
+                max_workers=DETECTION_WORKERS, thread_name_prefix="deteccion",
+                initializer=_pin_current_thread, initargs=(DETECTION_CPUS,)
+            )
             
             # Iniciar hilos
             self.capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
@@ -122,20 +544,21 @@ class IMX500CameraHandler:
     def stop(self):
         """Detiene la captura de video"""
         self.is_running = False
+        self._stop_event.set()
+        self._wake_processing()
         
         # Detener proceso de cámara si está activo
-        if self.camera_process and self.camera_process.poll() is None:
-            self.camera_process.terminate()
-            try:
-                self.camera_process.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                self.camera_process.kill()
+        self._stop_rpicam_stream()
         
         # Esperar a que terminen los hilos
         if hasattr(self, 'capture_thread'):
             self.capture_thread.join(timeout=2)
         if hasattr(self, 'processing_thread'):
             self.processing_thread.join(timeout=2)
+        if self._detection_pool is not None:
+            self._detection_pool.shutdown(wait=False)
+            self._detection_pool = None
+        self._close_picamera2()
         
         self.camera_status = "STOPPED"
         logger.info("Cámara detenida")
@@ -143,84 +566,118 @@ class IMX500CameraHandler:
     def _capture_loop(self):
         """Hilo principal de captura de frames desde la cámara IMX500"""
         logger.info("Hilo de captura iniciado")
+        _pin_current_thread(CAPTURE_CPUS)
         
+        # El try envuelve el bucle de captura completo (no cada frame): solo se
+        # vuelve a entrar tras un error
         while self.is_running:
             try:
-                # Capturar frame usando rpicam-still
-                frame = self._capture_single_frame()
-                
-                if frame is not None:
-                    # Actualizar FPS
-                    current_time = time.time()
-                    self.fps_counter.append(current_time - self.last_fps_time)
-                    self.last_fps_time = current_time
+                while self.is_running:
+                    # Reconexión programada: esperar el backoff sin bloquear stop()
+                    if self._retry_at is not None:
+                        if self._stop_event.wait(max(0.0, self._retry_at - time.monotonic())):
+                            break
+                        self._retry_at = None
+                        self._init_camera()
+                        continue
                     
-                    if len(self.fps_counter) >= 30:
-                        self.current_fps = 1.0 / (sum(self.fps_counter) / len(self.fps_counter))
+                    # Capturar frame
+                    frame = self._capture_single_frame()
+                    
+                    if frame is None:
+                        # Frame no disponible, intentar reconexión
+                        self._handle_camera_error("Error al leer frame de la cámara")
+                        self._stop_event.wait(0.033)
+                        continue
+                    
+                    # Actualizar FPS (reloj monotónico: inmune a ajustes de NTP)
+                    current_time = time.monotonic()
+                    dt = current_time - self.last_fps_time
+                    self.last_fps_time = current_time
+                    self._ema_dt += FPS_EMA_ALPHA * (dt - self._ema_dt)
+                    self.current_fps = 1.0 / self._ema_dt
                     
-                    # Agregar frame a la cola para procesamiento
-                    if not self.frame_queue.full():
-                        self.frame_queue.put(frame.copy())
+                    # Copiar el frame a un slot libre del buffer circular (única copia)
+                    with self._latest_cv:
+                        idx = self._next_free_slot()
+                    slot = self._frame_slots[idx]
+                    np.copyto(slot, frame)
+                    self._slot_faces[idx] = self._sensor_faces
                     
                     # Actualizar frame actual
-                    self.current_frame = frame.copy()
+                    self._current_idx = idx
+                    self.current_frame = slot
+                    
+                    # Publicar como último frame (reemplaza al que no se llegó
+                    # a procesar) y despertar al procesamiento
+                    with self._latest_cv:
+                        self._latest_idx = idx
+                        self._latest_cv.notify()
                     
                     # Resetear contador de reconexión si la cámara funciona
                     self.reconnection_attempts = 0
                     self.camera_status = "RUNNING"
                     
-                else:
-                    # Frame no disponible, intentar reconexión
-                    self._handle_camera_error("Error al leer frame de la cámara")
-                    
-                # Control de frecuencia
-                time.sleep(0.033)  # ~30 FPS
+                    # Sin pausa fija: la lectura de picamera2/rpicam-vid (o el
+                    # propio rpicam-still) bloquea hasta el frame siguiente
                 
             except Exception as e:
                 self._handle_camera_error(f"Error en captura: {e}")
-                time.sleep(0.1)
+                self._stop_event.wait(0.1)
         
         logger.info("Hilo de captura terminado")
     
+    def _next_free_slot(self) -> int:
+        """
+        Próximo slot del buffer circular que nadie está usando: ni el frame
+        actual, ni el que espera al procesamiento, ni los que analiza el pool.
+        Se llama con _latest_cv tomado
+        """
+        for _ in range(self._ring_size):
+            idx = next(self._slot_counter) % self._ring_size
+            if (idx != self._current_idx and idx != self._latest_idx
+                    and idx not in self._busy_slots):
+                return idx
+        return idx
+    
     def _capture_single_frame(self):
         """Captura un frame individual desde la cámara IMX500"""
+        if self.picam2 is not None:
+            return self._capture_picamera2_frame()
+        if self.camera_process is not None:
+            return self._capture_stream_frame()
+        
         try:
-            # Usar rpicam-still para capturar un frame
-            output_path = "tmp/camera_frame.jpg"
-            
-            # Comando para capturar frame
+            # rpicam-still escribe el JPEG en stdout: se decodifica desde
+            # memoria, sin archivo temporal en la SD
             cmd = [
                 'rpicam-still',
                 '--camera', str(self.camera_index),
-                '--timeout', '1000',  # 1 segundo
+                '--timeout', '1',
+                '--immediate',
                 '--nopreview',
-                '--output', output_path
+                '--encoding', 'jpg',
+                '--output', '-'
             ]
             
             # Ejecutar comando
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
+            result = subprocess.run(cmd, capture_output=True, timeout=5)
             
-            if result.returncode == 0 and os.path.exists(output_path):
-                # Leer frame capturado
-                frame = cv2.imread(output_path)
+            if result.returncode == 0 and result.stdout:
+                # Decodificar frame capturado
+                frame = cv2.imdecode(np.frombuffer(result.stdout, np.uint8), cv2.IMREAD_COLOR)
                 
                 if frame is not None:
                     # Redimensionar si es necesario
                     if frame.shape[:2] != (self.frame_height, self.frame_width):
                         frame = cv2.resize(frame, (self.frame_width, self.frame_height))
                     
-                    # Limpiar archivo temporal
-                    try:
-                        os.remove(output_path)
-                    except:
-                        pass
-                    
                     return frame
                 else:
-                    logger.warning("Frame capturado pero no se pudo leer")
+                    logger.warning("Frame capturado pero no se pudo decodificar")
                     return None
             else:
-                logger.warning(f"Error al capturar frame: {result.stderr}")
+                logger.warning(f"Error al capturar frame: {result.stderr.decode(errors='replace')}")
                 return None
                 
         except subprocess.TimeoutExpired:
@@ -230,8 +687,69 @@ class IMX500CameraHandler:
             logger.error(f"Error al capturar frame: {e}")
             return None
     
+    def _capture_stream_frame(self):
+        """Lee exactamente un frame YUV420 (I420) del stdout de rpicam-vid y lo
+        convierte a BGR sobre un buffer preasignado"""
+        try:
+            view = memoryview(self._yuv_buffer).cast('B')
+            read = 0
+            while read < len(view):
+                n = self.camera_process.stdout.readinto(view[read:])
+                if not n:
+                    logger.warning("El stream de rpicam-vid se cerró")
+                    self._stop_rpicam_stream()
+                    return None
+                read += n
+            
+            # Quien llama copia el frame a su slot: el buffer BGR se reutiliza
+            cv2.cvtColor(self._yuv_buffer, cv2.COLOR_YUV2BGR_I420, dst=self._stream_frame)
+            return self._stream_frame
+            
+        except Exception as e:
+            logger.error(f"Error al leer el stream de rpicam-vid: {e}")
+            self._stop_rpicam_stream()
+            return None
+    
+    def _capture_picamera2_frame(self):
+        """Toma el próximo frame del stream de picamera2 (y, si hay modelo en
+        el IMX500, los rostros que infirió el sensor para ese mismo frame)"""
+        try:
+            if self.imx500 is None:
+                frame = self.picam2.capture_array("main")
+            else:
+                request = self.picam2.capture_request()
+                try:
+                    frame = request.make_array("main")
+                    metadata = request.get_metadata()
+                finally:
+                    request.release()
+                self._sensor_faces = self._parse_sensor_outputs(metadata)
+            
+            if frame.shape[:2] != (self.frame_height, self.frame_width):
+                frame = cv2.resize(frame, (self.frame_width, self.frame_height))
+            return frame
+        except Exception as e:
+            logger.error(f"Error al capturar frame con picamera2: {e}")
+            return None
+    
+    def _parse_sensor_outputs(self, metadata) -> List[Tuple[np.ndarray, Tuple[int, int, int, int], float]]:
+        """Convierte los tensores de salida del IMX500 en (embedding, bbox, confianza)"""
+        outputs = self.imx500.get_outputs(metadata, add_batch=True)
+        if outputs is None:
+            return []
+        
+        boxes, scores, embeddings = outputs[0][0], outputs[1][0], outputs[2][0]
+        face_data = []
+        for box, score, embedding in zip(boxes, scores, embeddings):
+            if score < SENSOR_MIN_SCORE:
+                continue
+            x, y, w, h = self.imx500.convert_inference_coords(box, metadata, self.picam2)
+            face_data.append((np.asarray(embedding, dtype=np.float32), (x, y, w, h), float(score)))
+        return face_data
+    
     def _handle_camera_error(self, error_msg):
-        """Maneja errores de la cámara con reconexión automática"""
+        """Maneja errores de la cámara con reconexión automática. No espera:
+        programa el reintento y el bucle de captura lo ejecuta al vencer"""
         logger.error(error_msg)
         self.last_error = error_msg
         self.camera_status = "ERROR"
@@ -241,79 +759,243 @@ class IMX500CameraHandler:
             backoff_time = self.reconnection_backoff[min(self.reconnection_attempts, len(self.reconnection_backoff) - 1)]
             logger.info(f"Reintentando conexión en {backoff_time}s (intento {self.reconnection_attempts + 1}/{self.max_reconnection_attempts})")
             
-            time.sleep(backoff_time)
+            self._retry_at = time.monotonic() + backoff_time
             self.reconnection_attempts += 1
-            
-            # Intentar reinicializar cámara
-            self._init_camera()
         else:
             logger.error("Se excedió el límite de intentos de reconexión")
             self.camera_status = "FAILED"
     
     def _processing_loop(self):
-        """Hilo de procesamiento de rostros y generación de embeddings simulados"""
+        """Hilo de procesamiento de rostros y generación de embeddings simulados.
+        Reparte los frames entre los hilos del pool y publica los resultados
+        en orden de captura"""
         logger.info("Hilo de procesamiento iniciado")
+        _pin_current_thread(DETECTION_CPUS)
+        pending = deque()
         
+        # Igual que en la captura, el try se reinstala solo tras un error
         while self.is_running:
             try:
-                if not self.frame_queue.empty():
-                    frame = self.frame_queue.get()
+                while self.is_running:
+                    # Mantener hasta DETECTION_WORKERS frames en análisis
+                    while len(pending) < DETECTION_WORKERS:
+                        with self._latest_cv:
+                            # Esperar al próximo frame o a que el más antiguo en
+                            # análisis termine (su future notifica al terminar).
+                            # El timeout solo cubre un is_running apagado sin stop()
+                            self._latest_cv.wait_for(
+                                lambda: (self._latest_idx is not None or not self.is_running
+                                         or (pending and (pending[0][1] is None or pending[0][1].done()))),
+                                timeout=0.1
+                            )
+                            idx = self._latest_idx
+                            if idx is None:
+                                break
+                            self._busy_slots.add(idx)
+                            self._latest_idx = None
+                        
+                        frame = self._frame_slots[idx]
+                        # Con modelo en el IMX500 el sensor ya detectó y generó
+                        # los embeddings: no hay nada que calcular en la CPU
+                        if self.imx500 is not None:
+                            face_data = self._slot_faces[idx]
+                            if face_data:
+                                self._publish_faces(frame.copy(), face_data)
+                            self._busy_slots.discard(idx)
+                            continue
+                        # Una sola conversión a gris por frame, compartida por
+                        # el filtro de movimiento y la detección
+                        gray = self._detection_gray(frame)
+                        # Escena quieta: no se analiza, se repite el último
+                        # resultado sobre este frame cuando le toque el turno
+                        if not self._frame_changed(gray):
+                            pending.append((idx, None))
+                            continue
+                        future = self._detection_pool.submit(self._analyze_frame, frame, gray)
+                        future.add_done_callback(self._wake_processing)
+                        pending.append((idx, future))
                     
-                    # Detectar rostros usando detector Haar (fallback)
-                    faces = self._detect_faces(frame)
+                    if not pending:
+                        continue
                     
-                    if faces:
-                        # Generar embeddings simulados "desde la cámara"
-                        face_data = self._generate_camera_embeddings(frame, faces)
-                        
-                        # Agregar a cola de reconocimiento
-                        if not self.recognition_queue.full():
-                            self.recognition_queue.put((frame, face_data))
+                    # Con hilos libres, seguir tomando frames hasta que termine
+                    # el más antiguo
+                    if (len(pending) < DETECTION_WORKERS and pending[0][1] is not None
+                            and not pending[0][1].done()):
+                        continue
                     
-                    # Limpiar cola si está muy llena
-                    while self.frame_queue.qsize() > 5:
-                        try:
-                            self.frame_queue.get_nowait()
-                        except queue.Empty:
-                            break
-                            
-                else:
-                    time.sleep(0.01)
+                    # Esperar el más antiguo; los demás siguen analizándose
+                    idx, future = pending.popleft()
+                    try:
+                        if future is None:
+                            # Frame sin cambios: los mismos rostros que el anterior
+                            result = None
+                            if self._last_face_data:
+                                result = (self._frame_slots[idx].copy(), self._last_face_data)
+                        else:
+                            result = future.result()
+                            self._last_face_data = result[1] if result is not None else None
+                    finally:
+                        self._busy_slots.discard(idx)
+                    
+                    # Agregar a cola de reconocimiento
+                    if result is not None:
+                        self._publish_faces(*result)
                     
             except Exception as e:
                 logger.error(f"Error en procesamiento: {e}")
                 time.sleep(0.01)
         
+        for _, future in pending:
+            if future is not None:
+                future.cancel()
+        self._busy_slots.clear()
         logger.info("Hilo de procesamiento terminado")
     
-    def _detect_faces(self, frame) -> List[Tuple[int, int, int, int]]:
-        """Detecta rostros en el frame usando OpenCV (fallback)"""
-        if self.face_detector is None:
+    def _wake_processing(self, _future=None):
+        """Despierta al hilo de procesamiento (análisis terminado o stop)"""
+        with self._latest_cv:
+            self._latest_cv.notify_all()
+    
+    def _publish_faces(self, frame, face_data):
+        """Entrega los rostros de un frame al callback de reconocimiento si hay
+        uno registrado (no debe bloquear: corre en el hilo de procesamiento) o,
+        si no, a la cola que lee get_face_data. Con callback la cola no se
+        llena: nadie la vaciaría y guardaría copias de frames completos"""
+        if self.recognition_callback is not None:
+            try:
+                self.recognition_callback(frame, face_data)
+            except Exception as e:
+                logger.error(f"Error en callback de reconocimiento: {e}")
+        elif not self.recognition_queue.full():
+            self.recognition_queue.put((frame, face_data))
+    
+    def _frame_changed(self, gray) -> bool:
+        """
+        Compara una miniatura de la imagen gris de detección con la del último
+        frame analizado (suma de diferencias absolutas). Devuelve False si el
+        cambio medio por píxel es menor que MOTION_THRESHOLD
+        """
+        small = cv2.resize(gray, MOTION_THUMB_SIZE, interpolation=cv2.INTER_AREA)
+        
+        if self._prev_small is not None:
+            diff = cv2.norm(small, self._prev_small, cv2.NORM_L1)
+            if diff < MOTION_THRESHOLD * MOTION_THUMB_SIZE[0] * MOTION_THUMB_SIZE[1]:
+                return False
+        
+        self._prev_small = small
+        return True
+    
+    def _analyze_frame(self, frame, gray=None):
+        """
+        Detecta rostros y genera sus embeddings (corre en un hilo del pool).
+        Devuelve (frame, face_data) o None si no hay rostros
+        """
+        detections = self._detect_faces_scored(frame, self._worker_detector(), gray)
+        
+        if not detections:
+            return None
+        
+        # Generar embeddings simulados "desde la cámara"
+        faces = [bbox for bbox, _ in detections]
+        scores = [score for _, score in detections]
+        face_data = self._generate_camera_embeddings(frame, faces, scores)
+        
+        # Copia propia: el slot se reutiliza cuando el buffer circular da la vuelta
+        return frame.copy(), face_data
+    
+    def _worker_detector(self):
+        """Detector propio del hilo actual: tanto las cascadas como YuNet usan
+        buffers internos, así que cada hilo del pool carga su propia instancia"""
+        detector = getattr(self._worker_local, 'detector', None)
+        if detector is None:
+            if self.face_detector_path is not None:
+                detector = self._load_detector(self.face_detector_path)
+            else:
+                detector = self.face_detector
+            self._worker_local.detector = detector
+        return detector
+    
+    def _detection_gray(self, frame):
+        """
+        Imagen gris reducida sobre la que se detecta. Reducir primero y
+        convertir a gris después: cvtColor procesa 4x menos píxeles. Con
+        OpenCL la cadena resize -> cvtColor -> detectMultiScale corre sobre
+        un UMat
+        """
+        height, width = frame.shape[:2]
+        src = cv2.UMat(frame) if self.use_opencl else frame
+        small = cv2.resize(
+            src,
+            (int(width * DETECTION_SCALE), int(height * DETECTION_SCALE)),
+            interpolation=cv2.INTER_AREA
+        )
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    
+    def _detect_faces(self, frame, detector=None, gray=None) -> List[Tuple[int, int, int, int]]:
+        """Detecta rostros en el frame usando OpenCV (fallback). Los hilos del
+        pool pasan su propio detector; por defecto se usa self.face_detector.
+        gray: imagen de _detection_gray ya calculada para este frame"""
+        return [bbox for bbox, _ in self._detect_faces_scored(frame, detector, gray)]
+    
+    def _detect_faces_scored(self, frame, detector=None, gray=None) -> List[Tuple[Tuple[int, int, int, int], Optional[float]]]:
+        """Como _detect_faces, pero devuelve (bbox, puntaje). YuNet da su propio
+        puntaje; con las cascadas es None"""
+        if detector is None:
+            detector = self.face_detector
+        if detector is None:
             return []
         
         try:
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = self.face_detector.detectMultiScale(
+            inv = 1.0 / DETECTION_SCALE
+            
+            if self.face_detector_kind == 'yunet':
+                # YuNet trabaja sobre color: se reduce el frame sin pasar a gris
+                height, width = frame.shape[:2]
+                size = (int(width * DETECTION_SCALE), int(height * DETECTION_SCALE))
+                small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+                detector.setInputSize(size)
+                _, faces = detector.detect(small)
+                if faces is None:
+                    return []
+                # Filas: x, y, w, h, 5 puntos (x, y) y el puntaje en la columna 14
+                return [((max(0, int(f[0] * inv)), max(0, int(f[1] * inv)),
+                          int(f[2] * inv), int(f[3] * inv)), float(f[14]))
+                        for f in faces]
+            
+            if gray is None:
+                gray = self._detection_gray(frame)
+            # Solo escalas donde cabe un rostro: el tope es el menor entre
+            # MAX_FACE_SIZE y la mitad del lado corto de la imagen
+            # (gray puede ser un UMat: el tamaño sale del frame)
+            short_side = int(min(frame.shape[:2]) * DETECTION_SCALE)
+            max_side = min(int(MAX_FACE_SIZE * DETECTION_SCALE), short_side // 2)
+            faces = detector.detectMultiScale(
                 gray,
-                scaleFactor=1.1,
+                scaleFactor=1.2,
                 minNeighbors=5,
-                minSize=(30, 30)
+                minSize=(20, 20),
+                maxSize=(max_side, max_side),
+                flags=cv2.CASCADE_SCALE_IMAGE
             )
             
-            return [(x, y, w, h) for (x, y, w, h) in faces]
+            return [((int(x * inv), int(y * inv), int(w * inv), int(h * inv)), None)
+                    for (x, y, w, h) in faces]
             
         except Exception as e:
             logger.error(f"Error en detección de rostros: {e}")
             return []
     
-    def _generate_camera_embeddings(self, frame, faces: List[Tuple[int, int, int, int]]) -> List[Tuple[np.ndarray, Tuple[int, int, int, int], float]]:
+    def _generate_camera_embeddings(self, frame, faces: List[Tuple[int, int, int, int]],
+                                    scores: Optional[List[Optional[float]]] = None) -> List[Tuple[np.ndarray, Tuple[int, int, int, int], float]]:
         """
         Genera embeddings simulados "desde la cámara" como requieren las reglas
         En la implementación real, esto sería reemplazado por el modelo MobileFaceNet
+        scores: puntaje del detector por rostro; si hay, se usa como confianza
         """
         face_data = []
         
-        for (x, y, w, h) in faces:
+        for i, (x, y, w, h) in enumerate(faces):
             try:
                 # Extraer región del rostro
                 face_roi = frame[y:y+h, x:x+w]
@@ -321,21 +1003,20 @@ class IMX500CameraHandler:
                 if face_roi.size == 0:
                     continue
                 
-                # Redimensionar a tamaño estándar
-                face_resized = cv2.resize(face_roi, (128, 128))
-                
-                # Convertir a escala de grises
-                face_gray = cv2.cvtColor(face_resized, cv2.COLOR_BGR2GRAY)
-                
-                # Normalizar
-                face_normalized = face_gray.astype(np.float32) / 255.0
+                # Gris 128x128 y versión normalizada
+                face_gray, face_normalized = self._prepare_face(face_roi)
                 
                 # Generar embedding simulado "desde la cámara" (128 dimensiones)
                 # En la implementación real, esto sería el output del modelo MobileFaceNet en la cámara
-                embedding = self._simulate_camera_embedding(face_normalized)
+                embedding = self._simulate_camera_embedding(face_normalized, face_gray)
                 
-                # Calcular confianza de detección
-                confidence = self._calculate_detection_confidence(face_roi)
+                # Confianza: el puntaje del detector si lo dio; si no, la heurística
+                # de calidad (reutiliza el gris ya calculado)
+                score = scores[i] if scores is not None else None
+                if score is not None:
+                    confidence = score
+                else:
+                    confidence = self._calculate_detection_confidence(face_roi, face_gray)
                 
                 face_data.append((embedding, (x, y, w, h), confidence))
                 
@@ -345,55 +1026,89 @@ class IMX500CameraHandler:
         
         return face_data
     
-    def _simulate_camera_embedding(self, face_normalized: np.ndarray) -> np.ndarray:
+    def _prepare_face(self, face_roi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Lleva el ROI de un rostro al formato del embedding: gris uint8 de
+        128x128 y su versión float32 en [0, 1]. Convierte a gris antes de
+        redimensionar, así el resize trabaja sobre un solo canal.
+        Ambos resultados se escriben en buffers propios del hilo que se
+        reutilizan en el rostro siguiente: usarlos antes de volver a llamar
+        """
+        face_gray_buf, face_norm_buf = self._face_buffers()
+        gray_roi = cv2.cvtColor(face_roi, cv2.COLOR_BGR2GRAY)
+        # INTER_AREA al reducir (promedia y evita aliasing), INTER_LINEAR al
+        # ampliar rostros lejanos
+        interp = cv2.INTER_AREA if face_roi.shape[0] > 128 else cv2.INTER_LINEAR
+        face_gray = cv2.resize(gray_roi, (128, 128), dst=face_gray_buf, interpolation=interp)
+        # Conversión y escala en una sola pasada (multiplicar por 1/255, sin
+        # dividir ni crear un temporal intermedio)
+        face_normalized = np.multiply(face_gray, _INV_255, out=face_norm_buf)
+        return face_gray, face_normalized
+    
+    def _face_buffers(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Buffers 128x128 (gris uint8 y normalizado float32) del hilo actual.
+        Los hilos del pool preparan rostros a la vez, por eso uno por hilo"""
+        buffers = getattr(self._worker_local, 'face_buffers', None)
+        if buffers is None:
+            buffers = (np.empty((128, 128), dtype=np.uint8),
+                       np.empty((128, 128), dtype=np.float32))
+            self._worker_local.face_buffers = buffers
+        return buffers
+    
+    def _simulate_camera_embedding(self, face_normalized: np.ndarray,
+                                   face_gray: Optional[np.ndarray] = None) -> np.ndarray:
         """
         Simula la generación de embeddings desde la cámara IMX500
         En la implementación real, esto sería reemplazado por el modelo MobileFaceNet
+        face_gray: versión uint8 del rostro, si ya se tiene (evita reconstruirla)
         """
         try:
+            if face_gray is None:
+                face_gray = (face_normalized * 255.0 + 0.5).astype(np.uint8)
+            
+            # Con numba todo el cálculo corre compilado en un único kernel
+            if numba is not None:
+                return _embed_kernel(face_normalized, face_gray)
+            
             # Extraer características básicas (simulación del modelo de la cámara)
-            features = []
+            # directamente sobre el vector final, sin lista intermedia
+            embedding = np.empty(EMBEDDING_SIZE, dtype=np.float32)
             
             # Histograma de gradientes (simula características del modelo)
-            grad_x = cv2.Sobel(face_normalized, cv2.CV_64F, 1, 0, ksize=3)
-            grad_y = cv2.Sobel(face_normalized, cv2.CV_64F, 0, 1, ksize=3)
-            gradient_magnitude = np.sqrt(grad_x**2 + grad_y**2)
-            
-            # Estadísticas de gradientes
-            features.extend([
-                np.mean(gradient_magnitude),
-                np.std(gradient_magnitude),
-                np.max(gradient_magnitude)
-            ])
-            
-            # Características de textura
-            features.extend([
-                np.mean(face_normalized),
-                np.std(face_normalized),
-                np.percentile(face_normalized, 25),
-                np.percentile(face_normalized, 75)
-            ])
-            
-            # Características de forma
-            features.extend([
-                face_normalized.shape[0] / face_normalized.shape[1],  # Aspect ratio
-                np.sum(face_normalized > 0.5) / face_normalized.size  # Densidad
-            ])
-            
-            # Rellenar hasta 128 dimensiones con características adicionales
-            while len(features) < 128:
-                # Agregar características basadas en la posición
-                row_idx = len(features) % face_normalized.shape[0]
-                col_idx = len(features) % face_normalized.shape[1]
-                
-                if row_idx < face_normalized.shape[0] and col_idx < face_normalized.shape[1]:
-                    features.append(face_normalized[row_idx, col_idx])
-                else:
-                    features.append(0.0)
+            # En float32 y con cv2.magnitude: sin temporales float64 intermedios
+            grad_x = cv2.Sobel(face_normalized, cv2.CV_32F, 1, 0, ksize=3)
+            grad_y = cv2.Sobel(face_normalized, cv2.CV_32F, 0, 1, ksize=3)
+            gradient_magnitude = cv2.magnitude(grad_x, grad_y)
+            
+            # Estadísticas de gradientes (media y desvío en una sola pasada)
+            grad_mean, grad_std = cv2.meanStdDev(gradient_magnitude)
+            _, grad_max, _, _ = cv2.minMaxLoc(gradient_magnitude)
+            embedding[0] = grad_mean[0, 0]
+            embedding[1] = grad_std[0, 0]
+            embedding[2] = grad_max
             
-            # Normalizar el vector
-            embedding = np.array(features[:128], dtype=np.float32)
-            embedding = embedding / (np.linalg.norm(embedding) + 1e-8)
+            # Características de textura: media y desvío en una pasada. Los
+            # cuartiles salen del histograma de 256 niveles del rostro en uint8
+            # (precisión 1/255, sin ordenar)
+            face_mean, face_std = cv2.meanStdDev(face_normalized)
+            hist = cv2.calcHist([face_gray], [0], None, [256], [0, 256]).ravel()
+            cdf = np.cumsum(hist)
+            embedding[3] = face_mean[0, 0]
+            embedding[4] = face_std[0, 0]
+            embedding[5:7] = np.searchsorted(cdf, (0.25 * face_gray.size, 0.75 * face_gray.size)) / 255.0
+            
+            # Características de forma. La densidad cuenta sobre el gris uint8
+            # (> 127 equivale a > 0.5 normalizado) sin crear una máscara booleana
+            embedding[7] = face_gray.shape[0] / face_gray.shape[1]  # Aspect ratio
+            embedding[8] = cv2.countNonZero(cv2.compare(face_gray, 127, cv2.CMP_GT)) / face_gray.size  # Densidad
+            
+            # Rellenar hasta 128 dimensiones con características basadas en la
+            # posición: píxeles (k % alto, k % ancho) leídos en un solo gather
+            embedding[STAT_FEATURES:] = face_normalized[_FILL_IDX % face_normalized.shape[0],
+                                                        _FILL_IDX % face_normalized.shape[1]]
+            
+            # Norma L2 y escalado en una sola llamada, en el mismo buffer
+            cv2.normalize(embedding, embedding, norm_type=cv2.NORM_L2)
             
             return embedding
             
@@ -402,17 +1117,22 @@ class IMX500CameraHandler:
             # Retornar embedding aleatorio como fallback
             return np.random.rand(128).astype(np.float32)
     
-    def _calculate_detection_confidence(self, face_roi: np.ndarray) -> float:
-        """Calcula la confianza de detección del rostro"""
+    def _calculate_detection_confidence(self, face_roi: np.ndarray, face_gray: Optional[np.ndarray] = None) -> float:
+        """Calcula la confianza de detección del rostro. Si se pasa face_gray
+        (el rostro ya convertido a gris) no se vuelve a convertir el ROI"""
         try:
             # Calcular confianza basada en la calidad de la imagen
-            gray = cv2.cvtColor(face_roi, cv2.COLOR_BGR2GRAY)
+            if face_gray is None:
+                face_gray = cv2.cvtColor(face_roi, cv2.COLOR_BGR2GRAY)
             
-            # Contraste
-            contrast = np.std(gray)
+            # Con numba, todo el cálculo en un único kernel compilado
+            if numba is not None:
+                return _confidence_kernel(face_gray, float(face_roi.shape[0] * face_roi.shape[1]))
             
-            # Brillo
-            brightness = np.mean(gray)
+            # Brillo (media) y contraste (desvío) en una sola pasada
+            mean, std = cv2.meanStdDev(face_gray)
+            brightness = float(mean[0, 0])
+            contrast = float(std[0, 0])
             
             # Tamaño del rostro
             size_score = min(face_roi.shape[0] * face_roi.shape[1] / 10000, 1.0)
@@ -429,7 +1149,11 @@ class IMX500CameraHandler:
             return 0.5
     
     def get_current_frame(self):
-        """Obtiene el frame actual"""
+        """
+        Obtiene el frame actual sin copiarlo: es el slot del buffer circular
+        que publicó la captura. Es válido para leerlo enseguida (JPEG, vista
+        previa); quien lo modifique o lo retenga debe hacer su propia copia
+        """
         return self.current_frame
     
     def get_face_data(self) -> Optional[Tuple[np.ndarray, List[Tuple[np.ndarray, Tuple[int, int, int, int], float]]]]:
@@ -446,24 +1170,33 @@ class IMX500CameraHandler:
         return self.current_fps
     
     def get_camera_status(self) -> dict:
-        """Obtiene el estado completo de la cámara"""
-        return {
-            'status': self.camera_status,
-            'last_error': self.last_error,
-            'reconnection_attempts': self.reconnection_attempts,
-            'max_reconnection_attempts': self.max_reconnection_attempts,
-            'is_running': self.is_running,
-            'current_fps': self.current_fps
-        }
+        """Obtiene el estado completo de la cámara. Devuelve siempre el mismo
+        diccionario, actualizado en el lugar: es de solo lectura para quien llama"""
+        status = self._status_dict
+        status['status'] = self.camera_status
+        status['last_error'] = self.last_error
+        status['reconnection_attempts'] = self.reconnection_attempts
+        status['max_reconnection_attempts'] = self.max_reconnection_attempts
+        status['is_running'] = self.is_running
+        status['current_fps'] = self.current_fps
+        return status
     
     def set_recognition_callback(self, callback: Callable):
-        """Establece callback para reconocimiento facial"""
+        """Establece callback para reconocimiento facial. Desde ahí los rostros
+        van solo al callback: se descarta lo que quedó en la cola"""
         self.recognition_callback = callback
+        if callback is not None:
+            while True:
+                try:
+                    self.recognition_queue.get_nowait()
+                except queue.Empty:
+                    break
     
     def force_reconnection(self):
         """Fuerza una reconexión de la cámara"""
         logger.info("Forzando reconexión de la cámara")
         self.reconnection_attempts = 0
+        self._retry_at = None
         self._init_camera()
         
         if self.camera_status == "READY":
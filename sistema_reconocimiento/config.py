@@ -4,13 +4,19 @@ Raspberry Pi 5 + AI Camera
 """
 
 import os
-from typing import Dict, Any
+from types import MappingProxyType
+from typing import Dict, Any, Mapping
 
 class Config:
-    """Configuración centralizada del sistema"""
+    """
+    Configuración centralizada del sistema. Cada sección se guarda en un dict
+    privado (_CAMERA, ...) y se expone como vista de solo lectura (CAMERA, ...):
+    los getters devuelven la vista sin copiarla y los cambios pasan por
+    update_config o load_from_env
+    """
     
     # Configuración de la cámara
-    CAMERA = {
+    _CAMERA = {
         'index': 0,                    # Índice de la cámara (0, 1, etc.)
         'width': 640,                  # Ancho del frame
         'height': 480,                 # Alto del frame
@@ -18,25 +24,28 @@ class Config:
         'buffer_size': 10,             # Tamaño del buffer de frames
         'recognition_queue_size': 20,  # Tamaño de la cola de reconocimiento
     }
+    CAMERA = MappingProxyType(_CAMERA)
     
     # Configuración del reconocimiento facial
-    RECOGNITION = {
+    _RECOGNITION = {
         'confidence_threshold': 0.6,   # Umbral de confianza (0.0 - 1.0)
         'min_faces_for_recognition': 3, # Mínimo de frames para confirmar
         'recognition_interval': 0.1,   # Intervalo entre reconocimientos (segundos)
         'duplicate_timeout': 5.0,      # Tiempo para evitar duplicados (segundos)
         'bbox_distance_threshold': 50, # Distancia en píxeles para considerar mismo rostro
     }
+    RECOGNITION = MappingProxyType(_RECOGNITION)
     
     # Configuración de la base de datos
-    DATABASE = {
+    _DATABASE = {
         'path': 'face_recognition.db', # Ruta de la base de datos
         'backup_interval': 3600,      # Intervalo de backup automático (segundos)
         'max_logs': 10000,            # Máximo número de logs a mantener
     }
+    DATABASE = MappingProxyType(_DATABASE)
     
     # Configuración del servidor web
-    WEB = {
+    _WEB = {
         'host': '0.0.0.0',            # Host del servidor web
         'port': 8000,                 # Puerto del servidor web
         'debug': False,                # Modo debug
@@ -44,100 +53,106 @@ class Config:
         'workers': 1,                  # Número de workers
         'log_level': 'info',          # Nivel de logging
     }
+    WEB = MappingProxyType(_WEB)
     
     # Configuración del video
-    VIDEO = {
+    _VIDEO = {
         'jpeg_quality': 80,            # Calidad JPEG (1-100)
         'mjpeg_boundary': 'frame',     # Boundary para MJPEG
         'max_frame_size': 1024 * 1024, # Tamaño máximo de frame (bytes)
     }
+    VIDEO = MappingProxyType(_VIDEO)
     
     # Configuración del sistema
-    SYSTEM = {
+    _SYSTEM = {
         'log_level': 'INFO',           # Nivel de logging del sistema
         'max_threads': 4,              # Máximo número de hilos
         'health_check_interval': 10,   # Intervalo de health check (segundos)
         'stats_update_interval': 2,    # Intervalo de actualización de stats (segundos)
         'logs_update_interval': 5,     # Intervalo de actualización de logs (segundos)
     }
+    SYSTEM = MappingProxyType(_SYSTEM)
     
     # Configuración de rendimiento
-    PERFORMANCE = {
+    _PERFORMANCE = {
         'target_fps': 30,              # FPS objetivo
         'min_fps': 15,                 # FPS mínimo aceptable
         'max_latency': 0.1,            # Latencia máxima (segundos)
         'memory_limit_mb': 512,        # Límite de memoria (MB)
         'cpu_threshold': 80,           # Umbral de CPU (%)
     }
+    PERFORMANCE = MappingProxyType(_PERFORMANCE)
     
     # Configuración de seguridad
-    SECURITY = {
+    _SECURITY = {
         'enable_cors': True,           # Habilitar CORS
         'allowed_origins': ['*'],      # Orígenes permitidos
         'max_file_size': 10 * 1024 * 1024,  # Tamaño máximo de archivo (10MB)
         'rate_limit': 100,             # Límite de requests por minuto
     }
+    SECURITY = MappingProxyType(_SECURITY)
     
     @classmethod
-    def get_camera_config(cls) -> Dict[str, Any]:
+    def get_camera_config(cls) -> Mapping[str, Any]:
         """Obtiene configuración de la cámara"""
-        return cls.CAMERA.copy()
+        return cls.CAMERA
     
     @classmethod
-    def get_recognition_config(cls) -> Dict[str, Any]:
+    def get_recognition_config(cls) -> Mapping[str, Any]:
         """Obtiene configuración del reconocimiento"""
-        return cls.RECOGNITION.copy()
+        return cls.RECOGNITION
     
     @classmethod
-    def get_database_config(cls) -> Dict[str, Any]:
+    def get_database_config(cls) -> Mapping[str, Any]:
         """Obtiene configuración de la base de datos"""
-        return cls.DATABASE.copy()
+        return cls.DATABASE
     
     @classmethod
-    def get_web_config(cls) -> Dict[str, Any]:
+    def get_web_config(cls) -> Mapping[str, Any]:
         """Obtiene configuración del servidor web"""
-        return cls.WEB.copy()
+        return cls.WEB
     
     @classmethod
-    def get_video_config(cls) -> Dict[str, Any]:
+    def get_video_config(cls) -> Mapping[str, Any]:
         """Obtiene configuración del video"""
-        return cls.VIDEO.copy()
+        return cls.VIDEO
     
     @classmethod
-    def get_system_config(cls) -> Dict[str, Any]:
+    def get_system_config(cls) -> Mapping[str, Any]:
         """Obtiene configuración del sistema"""
-        return cls.SYSTEM.copy()
+        return cls.SYSTEM
     
     @classmethod
-    def get_performance_config(cls) -> Dict[str, Any]:
+    def get_performance_config(cls) -> Mapping[str, Any]:
         """Obtiene configuración de rendimiento"""
-        return cls.PERFORMANCE.copy()
+        return cls.PERFORMANCE
     
     @classmethod
-    def get_security_config(cls) -> Dict[str, Any]:
+    def get_security_config(cls) -> Mapping[str, Any]:
         """Obtiene configuración de seguridad"""
-        return cls.SECURITY.copy()
+        return cls.SECURITY
     
     @classmethod
     def get_all_config(cls) -> Dict[str, Any]:
-        """Obtiene toda la configuración"""
+        """Obtiene toda la configuración (copias en dicts comunes, serializables)"""
         return {
-            'camera': cls.get_camera_config(),
-            'recognition': cls.get_recognition_config(),
-            'database': cls.get_database_config(),
-            'web': cls.get_web_config(),
-            'video': cls.get_video_config(),
-            'system': cls.get_system_config(),
-            'performance': cls.get_performance_config(),
-            'security': cls.get_security_config(),
+            'camera': dict(cls.CAMERA),
+            'recognition': dict(cls.RECOGNITION),
+            'database': dict(cls.DATABASE),
+            'web': dict(cls.WEB),
+            'video': dict(cls.VIDEO),
+            'system': dict(cls.SYSTEM),
+            'performance': dict(cls.PERFORMANCE),
+            'security': dict(cls.SECURITY),
         }
     
     @classmethod
     def update_config(cls, section: str, key: str, value: Any) -> bool:
         """Actualiza una configuración específica"""
         try:
-            if hasattr(cls, section.upper()) and key in getattr(cls, section.upper()):
-                getattr(cls, section.upper())[key] = value
+            values = getattr(cls, '_' + section.upper(), None)
+            if isinstance(values, dict) and key in values:
+                values[key] = value  # La vista pública refleja el cambio
                 return True
             return False
         except Exception:
@@ -148,31 +163,31 @@ class Config:
         """Carga configuración desde variables de entorno"""
         # Cámara
         if os.getenv('CAMERA_INDEX'):
-            cls.CAMERA['index'] = int(os.getenv('CAMERA_INDEX'))
+            cls._CAMERA['index'] = int(os.getenv('CAMERA_INDEX'))
         
         if os.getenv('CAMERA_WIDTH'):
-            cls.CAMERA['width'] = int(os.getenv('CAMERA_WIDTH'))
+            cls._CAMERA['width'] = int(os.getenv('CAMERA_WIDTH'))
         
         if os.getenv('CAMERA_HEIGHT'):
-            cls.CAMERA['height'] = int(os.getenv('CAMERA_HEIGHT'))
+            cls._CAMERA['height'] = int(os.getenv('CAMERA_HEIGHT'))
         
         if os.getenv('CAMERA_FPS'):
-            cls.CAMERA['fps'] = int(os.getenv('CAMERA_FPS'))
+            cls._CAMERA['fps'] = int(os.getenv('CAMERA_FPS'))
         
         # Reconocimiento
         if os.getenv('RECOGNITION_THRESHOLD'):
-            cls.RECOGNITION['confidence_threshold'] = float(os.getenv('RECOGNITION_THRESHOLD'))
+            cls._RECOGNITION['confidence_threshold'] = float(os.getenv('RECOGNITION_THRESHOLD'))
         
         # Web
         if os.getenv('WEB_HOST'):
-            cls.WEB['host'] = os.getenv('WEB_HOST')
+            cls._WEB['host'] = os.getenv('WEB_HOST')
         
         if os.getenv('WEB_PORT'):
-            cls.WEB['port'] = int(os.getenv('WEB_PORT'))
+            cls._WEB['port'] = int(os.getenv('WEB_PORT'))
         
         # Base de datos
         if os.getenv('DB_PATH'):
-            cls.DATABASE['path'] = os.getenv('DB_PATH')
+            cls._DATABASE['path'] = os.getenv('DB_PATH')
     
     @classmethod
     def validate_config(cls) -> Dict[str, Any]:
@@ -208,14 +223,14 @@ Config.load_from_env()
 
 # Configuración específica para desarrollo
 if os.getenv('ENVIRONMENT') == 'development':
-    Config.WEB['debug'] = True
-    Config.WEB['reload'] = True
-    Config.SYSTEM['log_level'] = 'DEBUG'
+    Config._WEB['debug'] = True
+    Config._WEB['reload'] = True
+    Config._SYSTEM['log_level'] = 'DEBUG'
 
 # Configuración específica para producción
 if os.getenv('ENVIRONMENT') == 'production':
-    Config.WEB['debug'] = False
-    Config.WEB['reload'] = False
-    Config.SYSTEM['log_level'] = 'WARNING'
-    Config.SECURITY['enable_cors'] = False
-    Config.SECURITY['allowed_origins'] = ['localhost', '127.0.0.1'] 
\ No newline at end of file
+    Config._WEB['debug'] = False
+    Config._WEB['reload'] = False
+    Config._SYSTEM['log_level'] = 'WARNING'
+    Config._SECURITY['enable_cors'] = False
+    Config._SECURITY['allowed_origins'] = ['localhost', '127.0.0.1'] 
\ No newline at end of file
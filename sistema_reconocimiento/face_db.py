@@ -1,19 +1,125 @@
 import sqlite3
 import numpy as np
-from datetime import datetime
-import json
 from typing import List, Tuple, Optional
 import os
+import hashlib
+import threading
+import queue
+
+from fast_match import batch_match
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+# Con faiss y al menos esta cantidad de personas, find_match busca en un
+# índice IVF en vez de recorrer toda la galería
+FAISS_MIN_PEOPLE = 1000
+# Listas del IVF que se revisan por consulta (más = mejor recall, más lento)
+FAISS_NPROBE = 8
+
+# Los logs se encolan y un hilo los escribe en lote cada LOG_FLUSH_INTERVAL
+# segundos, de a LOG_BATCH_SIZE filas por transacción
+LOG_FLUSH_INTERVAL = 0.5
+LOG_BATCH_SIZE = 256
+
+# clear_old_logs borra de a LOG_DELETE_CHUNK filas por transacción y después
+# devuelve al sistema hasta VACUUM_PAGES páginas libres
+LOG_DELETE_CHUNK = 1000
+VACUUM_PAGES = 256
+
+def quantize_embedding(embedding: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Cuantiza un embedding a int8 con una escala por vector (embedding ≈ q * scale).
+    La similitud coseno no depende de la escala, así que para comparar basta q
+    """
+    embedding = np.asarray(embedding, dtype=np.float32)
+    peak = float(np.max(np.abs(embedding))) if embedding.size else 0.0
+    scale = peak / 127.0 if peak > 0 else 1.0
+    q = np.round(embedding / scale).astype(np.int8)
+    return q, scale
 
 class FaceDatabase:
     def __init__(self, db_path: str = "face_recognition.db"):
         self.db_path = db_path
+        # Galería cuantizada en memoria: (nombres, matriz int8 N x D, inversas
+        # de las normas de cada fila, índice faiss o None)
+        self._gallery = None
+        self._gallery_key = None
+        # Una sola conexión para toda la vida del objeto (la usan el hilo de
+        # reconocimiento y los de la web, de a uno por vez gracias al lock)
+        self._lock = threading.RLock()
+        self._conn = self._connect()
         self.init_database()
+        
+        # Escritura de logs en segundo plano: save_log no espera al disco
+        self._log_queue = queue.Queue()
+        self._log_stop = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Abre la conexión compartida con WAL y PRAGMAs de rendimiento"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        # Vacuum incremental: las páginas que liberan los borrados se
+        # recuperan de a poco, sin un VACUUM que bloquee toda la base. Solo
+        # tiene efecto al crear la base, por eso va antes que el modo WAL
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        # WAL: los lectores no bloquean al escritor (main y la web abren cada
+        # uno su FaceDatabase sobre el mismo archivo)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-64000")
+        conn.execute("PRAGMA mmap_size=134217728")
+        return conn
+    
+    def close(self):
+        """Escribe los logs pendientes y cierra la conexión con la base de datos"""
+        self._log_stop.set()
+        self._flusher.join(timeout=2)
+        self._flush_logs()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+    
+    def _flush_loop(self):
+        """Hilo que vuelca periódicamente la cola de logs"""
+        while not self._log_stop.wait(LOG_FLUSH_INTERVAL):
+            self._flush_logs()
+    
+    def _flush_logs(self):
+        """Escribe los logs encolados con un executemany por lote, cada lote
+        en una sola transacción"""
+        while True:
+            batch = []
+            try:
+                while len(batch) < LOG_BATCH_SIZE:
+                    batch.append(self._log_queue.get_nowait())
+            except queue.Empty:
+                pass
+            if not batch:
+                return
+            
+            try:
+                with self._lock, self._conn:
+                    self._conn.executemany(
+                        "INSERT INTO logs (persona_id, confianza, raw_payload) VALUES (?, ?, ?)",
+                        batch
+                    )
+            except Exception as e:
+                print(f"Error al guardar logs: {e}")
+                return
     
     def init_database(self):
         """Inicializa la base de datos con las tablas necesarias"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._lock, self._conn:
+            self._create_tables(self._conn.cursor())
+    
+    def _create_tables(self, cursor):
+        """Crea las tablas que falten y migra esquemas anteriores"""
         
         # Tabla de personas
         cursor.execute('''
@@ -21,10 +127,17 @@ class FaceDatabase:
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 nombre TEXT NOT NULL UNIQUE,
                 embedding BLOB NOT NULL,
-                fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                scale REAL
             )
         ''')
         
+        # Migración: bases creadas antes de guardar embeddings en int8. Las
+        # filas viejas quedan con scale NULL y el BLOB en float32
+        cursor.execute("PRAGMA table_info(personas)")
+        if 'scale' not in [column[1] for column in cursor.fetchall()]:
+            cursor.execute("ALTER TABLE personas ADD COLUMN scale REAL")
+        
         # Tabla de logs
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS logs (
@@ -37,88 +150,243 @@ class FaceDatabase:
             )
         ''')
         
-        conn.commit()
-        conn.close()
+        # Índices para los logs: orden y filtros por fecha (recientes,
+        # limpieza, estadísticas) y búsquedas por persona
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_logs_ts ON logs (timestamp DESC)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_logs_persona ON logs (persona_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_logs_persona_ts ON logs (persona_id, timestamp)")
+        
+        # Token aleatorio propio de este archivo de base. Los ids se reinician
+        # si la base se borra y se vuelve a crear: el token distingue la
+        # galería guardada en el .npy de la de otra base anterior
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS meta (
+                clave TEXT PRIMARY KEY,
+                valor TEXT NOT NULL
+            )
+        ''')
+        cursor.execute(
+            "INSERT OR IGNORE INTO meta (clave, valor) VALUES ('galeria_token', lower(hex(randomblob(16))))"
+        )
     
     def add_person(self, nombre: str, embedding: np.ndarray) -> bool:
         """Registra una nueva persona con su embedding facial"""
+        return self.add_people([(nombre, embedding)]) == 1
+    
+    def add_people(self, people: List[Tuple[str, np.ndarray]]) -> int:
+        """
+        Registra varias personas en una sola transacción (un executemany, un
+        solo commit) y retorna cuántas se agregaron. Los nombres que ya
+        existen se omiten
+        """
         try:
-            # Convertir embedding a BLOB (bytes)
-            embedding_bytes = embedding.tobytes()
-            
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute(
-                "INSERT INTO personas (nombre, embedding) VALUES (?, ?)",
-                (nombre, embedding_bytes)
-            )
-            
-            conn.commit()
-            conn.close()
-            return True
-        except sqlite3.IntegrityError:
-            # Nombre ya existe
-            return False
+            # Se guarda cuantizado: BLOB int8 (4 veces menos que float32) y
+            # la escala por vector en su propia columna
+            rows = []
+            for nombre, embedding in people:
+                quantized, scale = quantize_embedding(embedding)
+                rows.append((nombre, quantized.tobytes(), scale))
+            
+            with self._lock, self._conn:
+                cursor = self._conn.executemany(
+                    "INSERT OR IGNORE INTO personas (nombre, embedding, scale) VALUES (?, ?, ?)",
+                    rows
+                )
+            return max(cursor.rowcount, 0)
         except Exception as e:
             print(f"Error al agregar persona: {e}")
-            return False
+            return 0
     
     def find_match(self, embedding: np.ndarray, threshold: float = 0.6) -> Optional[Tuple[str, float]]:
-        """Busca una coincidencia en la base de datos usando distancia coseno"""
+        """Busca una coincidencia en la base de datos usando distancia coseno.
+        Acepta el embedding float32 o ya cuantizado con quantize_embedding"""
+        return self.find_matches([embedding], threshold)[0]
+    
+    def find_matches(self, embeddings, threshold: float = 0.6) -> List[Optional[Tuple[str, float]]]:
+        """Busca coincidencias para varios embeddings a la vez: una sola
+        multiplicación (B, D) x (D, N) contra la galería en lugar de B consultas"""
+        results: List[Optional[Tuple[str, float]]] = [None] * len(embeddings)
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT nombre, embedding FROM personas")
-            results = cursor.fetchall()
-            conn.close()
-            
-            if not results:
-                return None
-            
-            best_match = None
-            best_score = 0
-            
-            for nombre, embedding_bytes in results:
-                # Convertir BLOB de vuelta a numpy array
-                stored_embedding = np.frombuffer(embedding_bytes, dtype=np.float32)
+            with self._lock:
+                names, gallery, inv_norms, index = self._load_gallery(self._conn.cursor())
                 
-                # Calcular similitud coseno
-                similarity = self._cosine_similarity(embedding, stored_embedding)
+                if not names or not len(embeddings):
+                    return results
+                
+                # Similitud coseno sobre int8 con acumulación en int32 (4 veces
+                # menos memoria que float32). Un embedding que ya llega
+                # cuantizado se usa tal cual
+                pending = []
+                for i, embedding in enumerate(embeddings):
+                    if embedding.dtype == np.int8:
+                        query = embedding
+                    else:
+                        query, _ = quantize_embedding(embedding)
+                    query_norm = np.sqrt(np.einsum('i,i->', query, query, dtype=np.int32))
+                    if query_norm > 0:
+                        pending.append((i, query, query_norm))
+                
+                if pending:
+                    queries = np.stack([query for _, query, _ in pending])
+                    query_norms = np.array([norm for _, _, norm in pending], dtype=np.float32)
+                    matches = self._search_gallery(names, gallery, inv_norms, index,
+                                                   queries, query_norms, threshold)
+                    for (i, _, _), result in zip(pending, matches):
+                        results[i] = result
+                
+                return results
                 
-                if similarity > threshold and similarity > best_score:
-                    best_score = similarity
-                    best_match = nombre
-            
-            if best_match:
-                return (best_match, best_score)
-            return None
-            
         except Exception as e:
-            print(f"Error al buscar coincidencia: {e}")
-            return None
+            print(f"Error al buscar coincidencias: {e}")
+            return results
     
-    def _cosine_similarity(self, a: np.ndarray, b: np.ndarray) -> float:
-        """Calcula la similitud coseno entre dos vectores"""
-        dot_product = np.dot(a, b)
-        norm_a = np.linalg.norm(a)
-        norm_b = np.linalg.norm(b)
+    def _search_gallery(self, names, gallery, inv_norms, index, queries: np.ndarray,
+                        query_norms: np.ndarray, threshold: float) -> List[Optional[Tuple[str, float]]]:
+        """Mejor coincidencia de cada fila int8 de queries en la galería, si
+        supera el umbral"""
+        # Galerías grandes: vecino más cercano en el índice IVF (producto
+        # interno sobre vectores normalizados = coseno)
+        if index is not None:
+            normalized = (queries / query_norms[:, None]).astype(np.float32)
+            scores, ids = index.search(normalized, 1)
+            best_ids = ids[:, 0]
+            best_scores = scores[:, 0]
+        else:
+            # Todos los rostros contra toda la galería en una llamada (kernel
+            # JIT paralelo si hay numba); las filas ya traen su 1/norma
+            best_ids, best_scores = batch_match(queries, gallery, inv_norms, query_norms)
         
-        if norm_a == 0 or norm_b == 0:
-            return 0
+        results = []
+        for best, best_score in zip(best_ids, best_scores):
+            best, best_score = int(best), float(best_score)
+            if best >= 0 and best_score > threshold and best_score > 0:
+                results.append((names[best], best_score))
+            else:
+                results.append(None)
+        return results
+    
+    def _load_gallery(self, cursor):
+        """
+        Devuelve la galería cuantizada, recargándola solo si cambiaron las
+        personas registradas (cantidad o id máximo: los ids no se reutilizan)
+        """
+        cursor.execute("SELECT COUNT(*), MAX(id) FROM personas")
+        key = cursor.fetchone()
+        
+        if key != self._gallery_key:
+            cursor.execute("SELECT id, nombre, fecha_registro FROM personas ORDER BY id")
+            rows = cursor.fetchall()
+            names = [nombre for _, nombre, _ in rows]
+            
+            if rows:
+                # La matriz se mapea desde el .npy si corresponde a las mismas
+                # personas; si no, se arma desde los BLOBs y se reescribe
+                fingerprint = self._gallery_fingerprint(cursor, rows)
+                gallery = self._load_gallery_file(fingerprint, len(rows))
+                if gallery is None:
+                    cursor.execute("SELECT embedding, scale FROM personas ORDER BY id")
+                    # Las filas int8 se usan tal cual (el coseno no depende de
+                    # la escala); las viejas en float32 se cuantizan al cargar
+                    gallery = np.vstack([
+                        np.frombuffer(embedding_bytes, dtype=np.int8) if scale is not None
+                        else quantize_embedding(np.frombuffer(embedding_bytes, dtype=np.float32))[0]
+                        for embedding_bytes, scale in cursor.fetchall()
+                    ])
+                    self._save_gallery_file(fingerprint, gallery)
+                norms = np.sqrt(np.einsum('ij,ij->i', gallery, gallery, dtype=np.int32))
+                # Filas nulas quedan con similitud 0 (sin dividir por cero)
+                inv_norms = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+            else:
+                gallery = np.empty((0, 0), dtype=np.int8)
+                inv_norms = np.empty(0)
+            
+            self._gallery = (names, gallery, inv_norms, self._build_index(gallery, inv_norms))
+            self._gallery_key = key
         
-        return dot_product / (norm_a * norm_b)
+        return self._gallery
+    
+    def _gallery_paths(self) -> Tuple[str, str]:
+        """Rutas del .npy con la matriz int8 de la galería y del de su huella"""
+        base = os.path.splitext(self.db_path)[0]
+        return base + "_embeddings.npy", base + "_embeddings_key.npy"
+    
+    def _gallery_fingerprint(self, cursor, rows) -> np.ndarray:
+        """
+        Huella de las personas registradas: token de la base más (id, nombre,
+        fecha de registro) de cada fila, sin leer los BLOBs. Los ids solos no
+        alcanzan: se reinician en una base nueva y pueden repetirse al
+        restaurar un backup
+        """
+        cursor.execute("SELECT valor FROM meta WHERE clave = 'galeria_token'")
+        token = cursor.fetchone()
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr((token, rows)).encode())
+        return np.frombuffer(digest.digest(), dtype=np.uint8)
+    
+    def _load_gallery_file(self, fingerprint: np.ndarray, count: int) -> Optional[np.ndarray]:
+        """
+        Mapea en memoria (sin copiar ni decodificar) la galería guardada, o
+        None si no existe o no corresponde a las personas registradas
+        """
+        matrix_path, key_path = self._gallery_paths()
+        try:
+            if not (os.path.exists(matrix_path) and os.path.exists(key_path)):
+                return None
+            if not np.array_equal(np.load(key_path), fingerprint):
+                return None
+            gallery = np.load(matrix_path, mmap_mode='r')
+            if gallery.dtype != np.int8 or gallery.ndim != 2 or len(gallery) != count:
+                return None
+            return gallery
+        except Exception as e:
+            print(f"Error al cargar galería desde {matrix_path}: {e}")
+            return None
+    
+    def _save_gallery_file(self, fingerprint: np.ndarray, gallery: np.ndarray):
+        """Guarda la galería contigua junto a la base. Cada archivo se escribe
+        a un temporal y se reemplaza, así un mapeo abierto nunca ve un archivo a
+        medias; la huella va última para que una escritura cortada no valide
+        una matriz vieja"""
+        matrix_path, key_path = self._gallery_paths()
+        try:
+            if os.path.exists(key_path):
+                os.remove(key_path)
+            for path, array in ((matrix_path, np.ascontiguousarray(gallery)), (key_path, fingerprint)):
+                tmp_path = path + ".tmp"
+                with open(tmp_path, 'wb') as f:
+                    np.save(f, array)
+                os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Error al guardar galería en {matrix_path}: {e}")
+    
+    def _build_index(self, gallery: np.ndarray, inv_norms: np.ndarray):
+        """
+        Índice IVF de faiss sobre la galería normalizada, o None si faiss no
+        está instalado o hay pocas personas (ahí el recorrido completo gana).
+        Se reconstruye junto con la galería, así que altas y bajas quedan al día
+        """
+        if faiss is None or len(gallery) < FAISS_MIN_PEOPLE:
+            return None
+        
+        try:
+            vectors = np.ascontiguousarray(gallery * inv_norms[:, None], dtype=np.float32)
+            dim = vectors.shape[1]
+            nlist = max(1, int(np.sqrt(len(vectors))))
+            index = faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, nlist, faiss.METRIC_INNER_PRODUCT)
+            index.train(vectors)
+            index.add(vectors)
+            index.nprobe = min(FAISS_NPROBE, nlist)
+            return index
+        except Exception as e:
+            print(f"Error al construir índice faiss: {e}")
+            return None
     
     def list_people(self) -> List[Tuple[int, str, str]]:
         """Lista todas las personas registradas"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT id, nombre, fecha_registro FROM personas ORDER BY nombre")
-            results = cursor.fetchall()
-            conn.close()
+            with self._lock:
+                cursor = self._conn.execute("SELECT id, nombre, fecha_registro FROM personas ORDER BY nombre")
+                results = cursor.fetchall()
             
             return results
         except Exception as e:
@@ -126,18 +394,10 @@ class FaceDatabase:
             return []
     
     def save_log(self, persona_id: Optional[int], confianza: float, raw_payload: str = None) -> bool:
-        """Guarda un log de reconocimiento"""
+        """Guarda un log de reconocimiento. No bloquea: el registro se encola
+        y el hilo de escritura lo guarda en el próximo lote"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute(
-                "INSERT INTO logs (persona_id, confianza, raw_payload) VALUES (?, ?, ?)",
-                (persona_id, confianza, raw_payload)
-            )
-            
-            conn.commit()
-            conn.close()
+            self._log_queue.put((persona_id, confianza, raw_payload))
             return True
         except Exception as e:
             print(f"Error al guardar log: {e}")
@@ -146,19 +406,17 @@ class FaceDatabase:
     def get_recent_logs(self, limit: int = 50) -> List[Tuple[str, str, float, str]]:
         """Obtiene los logs más recientes con nombres de personas"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT p.nombre, l.timestamp, l.confianza, l.raw_payload
-                FROM logs l 
-                LEFT JOIN personas p ON l.persona_id = p.id 
-                ORDER BY l.timestamp DESC 
-                LIMIT ?
-            ''', (limit,))
-            
-            results = cursor.fetchall()
-            conn.close()
+            self._flush_logs()
+            with self._lock:
+                cursor = self._conn.execute('''
+                    SELECT p.nombre, l.timestamp, l.confianza, l.raw_payload
+                    FROM logs l 
+                    LEFT JOIN personas p ON l.persona_id = p.id 
+                    ORDER BY l.timestamp DESC 
+                    LIMIT ?
+                ''', (limit,))
+                
+                results = cursor.fetchall()
             
             return results
         except Exception as e:
@@ -168,17 +426,14 @@ class FaceDatabase:
     def delete_person(self, person_id: int) -> bool:
         """Elimina una persona y sus logs asociados"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Eliminar logs primero
-            cursor.execute("DELETE FROM logs WHERE persona_id = ?", (person_id,))
-            
-            # Eliminar persona
-            cursor.execute("DELETE FROM personas WHERE id = ?", (person_id,))
-            
-            conn.commit()
-            conn.close()
+            self._flush_logs()
+            # Ambos DELETE en una misma transacción
+            with self._lock, self._conn:
+                # Eliminar logs primero
+                self._conn.execute("DELETE FROM logs WHERE persona_id = ?", (person_id,))
+                
+                # Eliminar persona
+                self._conn.execute("DELETE FROM personas WHERE id = ?", (person_id,))
             return True
         except Exception as e:
             print(f"Error al eliminar persona: {e}")
@@ -187,16 +442,17 @@ class FaceDatabase:
     def get_person_by_id(self, person_id: int) -> Optional[Tuple[int, str, np.ndarray]]:
         """Obtiene una persona por su ID"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT id, nombre, embedding FROM personas WHERE id = ?", (person_id,))
-            result = cursor.fetchone()
-            conn.close()
+            with self._lock:
+                cursor = self._conn.execute("SELECT id, nombre, embedding, scale FROM personas WHERE id = ?", (person_id,))
+                result = cursor.fetchone()
             
             if result:
-                # Convertir BLOB de vuelta a numpy array
-                embedding = np.frombuffer(result[2], dtype=np.float32)
+                # Convertir BLOB de vuelta a numpy array float32 (int8 * escala,
+                # o float32 directo en las filas anteriores a la cuantización)
+                if result[3] is not None:
+                    embedding = np.frombuffer(result[2], dtype=np.int8) * np.float32(result[3])
+                else:
+                    embedding = np.frombuffer(result[2], dtype=np.float32)
                 return (result[0], result[1], embedding)
             return None
             
@@ -207,32 +463,20 @@ class FaceDatabase:
     def get_database_stats(self) -> dict:
         """Obtiene estadísticas de la base de datos"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Contar personas
-            cursor.execute("SELECT COUNT(*) FROM personas")
-            people_count = cursor.fetchone()[0]
-            
-            # Contar logs
-            cursor.execute("SELECT COUNT(*) FROM logs")
-            logs_count = cursor.fetchone()[0]
-            
-            # Contar logs recientes (últimas 24 horas)
-            cursor.execute("""
-                SELECT COUNT(*) FROM logs 
-                WHERE timestamp > datetime('now', '-1 day')
-            """)
-            recent_logs_count = cursor.fetchone()[0]
-            
-            # Contar reconocimientos exitosos
-            cursor.execute("""
-                SELECT COUNT(*) FROM logs 
-                WHERE persona_id IS NOT NULL
-            """)
-            successful_recognitions = cursor.fetchone()[0]
-            
-            conn.close()
+            self._flush_logs()
+            with self._lock:
+                # Todos los conteos en una sola consulta: personas, logs,
+                # logs de las últimas 24 horas y reconocimientos exitosos
+                # (COUNT de una columna no cuenta los NULL)
+                cursor = self._conn.execute("""
+                    SELECT
+                        (SELECT COUNT(*) FROM personas),
+                        COUNT(*),
+                        COUNT(CASE WHEN timestamp > datetime('now', '-1 day') THEN 1 END),
+                        COUNT(persona_id)
+                    FROM logs
+                """)
+                people_count, logs_count, recent_logs_count, successful_recognitions = cursor.fetchone()
             
             return {
                 'total_people': people_count,
@@ -258,26 +502,32 @@ class FaceDatabase:
     def clear_old_logs(self, days: int = 30) -> int:
         """Limpia logs antiguos y retorna el número de logs eliminados"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Contar logs que se van a eliminar
-            cursor.execute("""
-                SELECT COUNT(*) FROM logs 
-                WHERE timestamp < datetime('now', '-{} days')
-            """.format(days))
-            
-            count_to_delete = cursor.fetchone()[0]
-            
-            # Eliminar logs antiguos
-            cursor.execute("""
-                DELETE FROM logs 
-                WHERE timestamp < datetime('now', '-{} days')
-            """.format(days))
-            
-            deleted_count = cursor.rowcount
-            conn.commit()
-            conn.close()
+            self._flush_logs()
+            deleted_count = 0
+            
+            # Eliminar logs antiguos por tandas, cada una en su propia
+            # transacción corta: entre tanda y tanda el lock de escritura
+            # queda libre para el volcado de logs (consulta parametrizada:
+            # mismo plan para cualquier cantidad de días)
+            while True:
+                with self._lock, self._conn:
+                    cursor = self._conn.execute("""
+                        DELETE FROM logs 
+                        WHERE id IN (
+                            SELECT id FROM logs
+                            WHERE timestamp < datetime('now', ?)
+                            LIMIT ?
+                        )
+                    """, (f'-{int(days)} days', LOG_DELETE_CHUNK))
+                if cursor.rowcount <= 0:
+                    break
+                deleted_count += cursor.rowcount
+            
+            # Devolver parte de las páginas liberadas. Con executescript la
+            # PRAGMA corre completa (execute solo avanzaría una página)
+            if deleted_count:
+                with self._lock:
+                    self._conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES});")
             
             return deleted_count
             
@@ -288,8 +538,19 @@ class FaceDatabase:
     def backup_database(self, backup_path: str) -> bool:
         """Crea una copia de seguridad de la base de datos"""
         try:
-            import shutil
-            shutil.copy2(self.db_path, backup_path)
+            # Con WAL el archivo principal puede no tener las últimas
+            # escrituras: la API de backup de SQLite copia el estado completo.
+            # Se copia desde una conexión propia y en un solo paso (una única
+            # instantánea de lectura): con WAL no frena las escrituras de logs
+            # ni toma el lock de la conexión compartida
+            self._flush_logs()
+            source = sqlite3.connect(self.db_path)
+            backup = sqlite3.connect(backup_path)
+            try:
+                source.backup(backup)
+            finally:
+                backup.close()
+                source.close()
             return True
         except Exception as e:
             print(f"Error al crear backup: {e}")
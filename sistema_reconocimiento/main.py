@@ -12,6 +12,7 @@ Este archivo orquesta todos los componentes del sistema:
 
 import asyncio
 import threading
+import queue
 import time
 import signal
 import sys
@@ -21,6 +22,7 @@ import logging
 
 from face_db import FaceDatabase
 from recognizer import FaceRecognizer
+import fast_match
 from camera_handler import IMX500CameraHandler
 from webapp import app
 from utils import log_system_event, get_all_metrics
@@ -48,7 +50,10 @@ class FaceRecognitionSystem:
         self.frame_height = 480
         self.web_host = "0.0.0.0"
         self.web_port = 8000
-        self.recognition_interval = 0.1
+        
+        # Rostros detectados pendientes de reconocer: los encola el callback
+        # de la cámara y los consume el hilo de reconocimiento
+        self._face_queue = queue.Queue(maxsize=8)
         
         # Manejo de señales
         signal.signal(signal.SIGINT, self._signal_handler)
@@ -78,6 +83,8 @@ class FaceRecognitionSystem:
             # Inicializar reconocedor facial
             logger.info("  - Inicializando reconocedor facial...")
             self.face_recognizer = FaceRecognizer(self.face_db)
+            # Compilar ahora el kernel de búsqueda (numba) y no en el primer frame
+            fast_match.warmup()
             logger.info("    ✓ Reconocedor facial inicializado")
             
             # Inicializar cámara IMX500
@@ -116,61 +123,59 @@ class FaceRecognitionSystem:
             return False
     
     def _on_face_detected(self, frame, face_data):
-        """Callback cuando se detectan rostros"""
+        """Callback cuando se detectan rostros. Corre en el hilo de la cámara:
+        solo encola, y si el reconocimiento va atrasado descarta el frame"""
+        if not face_data:
+            return
         try:
-            if face_data and self.face_recognizer:
-                # Preparar datos para reconocimiento
-                recognition_input = [(emb, bbox) for emb, bbox, conf in face_data]
-                
-                # Realizar reconocimiento
-                results = self.face_recognizer.batch_recognize(recognition_input)
-                
-                for nombre, confianza, es_nuevo, bbox in results:
-                    if nombre:
-                        logger.info(f"Rostro reconocido: {nombre} (confianza: {confianza:.2f})")
-                        log_system_event("INFO", f"Reconocimiento exitoso: {nombre} ({confianza:.2f})")
-                    else:
-                        logger.info(f"Rostro desconocido detectado (confianza: {confianza:.2f})")
-                        log_system_event("INFO", f"Rostro desconocido detectado ({confianza:.2f})")
-                        
-        except Exception as e:
-            logger.error(f"Error en callback de reconocimiento: {e}")
-            log_system_event("ERROR", f"Error en callback de reconocimiento: {e}")
+            self._face_queue.put_nowait((frame, face_data))
+        except queue.Full:
+            pass
     
     def _recognition_loop(self):
-        """Hilo principal de reconocimiento facial"""
+        """Hilo principal de reconocimiento facial. Duerme en la cola hasta que
+        la cámara entrega rostros; termina al recibir None"""
         logger.info("Hilo de reconocimiento iniciado")
         
-        while self.is_running:
+        stop = False
+        while not stop:
+            item = self._face_queue.get()
+            if item is None:
+                break
+            
             try:
-                if self.camera_handler and self.face_recognizer:
-                    # Obtener datos de rostros de la cámara
-                    face_data = self.camera_handler.get_face_data()
-                    
-                    if face_data:
-                        frame, faces = face_data
-                        
-                        if faces:
-                            # Preparar datos para reconocimiento
-                            recognition_input = [(emb, bbox) for emb, bbox, conf in faces]
-                            
-                            # Realizar reconocimiento
-                            results = self.face_recognizer.batch_recognize(recognition_input)
-                            
-                            # Procesar resultados
-                            for nombre, confianza, es_nuevo, bbox in results:
-                                if nombre and es_nuevo:
-                                    logger.info(f"✓ {nombre} reconocido (confianza: {confianza:.2f})")
-                                elif not nombre:
-                                    logger.debug(f"? Rostro desconocido detectado")
+                # Juntar lo que se acumuló mientras tanto y reconocer todo en
+                # un solo lote
+                faces = list(item[1])
+                while True:
+                    try:
+                        item = self._face_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stop = True
+                        break
+                    faces.extend(item[1])
+                
+                if not self.face_recognizer:
+                    continue
+                
+                # Preparar datos para reconocimiento
+                recognition_input = [(emb, bbox) for emb, bbox, conf in faces]
+                
+                # Realizar reconocimiento
+                results = self.face_recognizer.batch_recognize(recognition_input)
                 
-                # Control de frecuencia
-                time.sleep(self.recognition_interval)
+                # Procesar resultados
+                for nombre, confianza, es_nuevo, bbox in results:
+                    if nombre and es_nuevo:
+                        logger.info(f"✓ {nombre} reconocido (confianza: {confianza:.2f})")
+                    elif not nombre:
+                        logger.debug(f"? Rostro desconocido detectado")
                 
             except Exception as e:
                 logger.error(f"Error en hilo de reconocimiento: {e}")
                 log_system_event("ERROR", f"Error en hilo de reconocimiento: {e}")
-                time.sleep(0.1)
         
         logger.info("Hilo de reconocimiento terminado")
     
@@ -259,12 +264,20 @@ class FaceRecognitionSystem:
                 pass
             logger.info("    ✓ Servidor web detenido")
         
-        # Esperar hilo de reconocimiento
+        # Esperar hilo de reconocimiento (None en la cola lo despierta y termina)
         if self.recognition_thread and self.recognition_thread.is_alive():
             logger.info("  - Esperando hilo de reconocimiento...")
+            try:
+                self._face_queue.put(None, timeout=1)
+            except queue.Full:
+                pass
             self.recognition_thread.join(timeout=3)
             logger.info("    ✓ Hilo de reconocimiento terminado")
         
+        # Cerrar la conexión con la base de datos
+        if self.face_db:
+            self.face_db.close()
+        
         logger.info("✓ Sistema detenido correctamente")
         log_system_event("INFO", "Sistema detenido correctamente")
     
@@ -154,7 +154,7 @@ class MobileFaceNetIntegration:
             rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
             
             # Normalizar
-            normalized = rgb_frame.astype(np.float32) / 255.0
+            normalized = np.multiply(rgb_frame, np.float32(1.0 / 255.0), dtype=np.float32)
             
             # Redimensionar si es necesario
             if normalized.shape[:2] != self.input_shape:
@@ -199,12 +199,13 @@ class MobileFaceNetIntegration:
             # Extraer ROI
             face_roi = frame[y:y+h, x:x+w]
             
-            # Redimensionar al tamaño de entrada del modelo
-            face_resized = cv2.resize(face_roi, self.input_shape)
+            # Redimensionar al tamaño de entrada del modelo (INTER_AREA al reducir)
+            interp = cv2.INTER_AREA if h > self.input_shape[1] else cv2.INTER_LINEAR
+            face_resized = cv2.resize(face_roi, self.input_shape, interpolation=interp)
             
             # Convertir a RGB y normalizar
             face_rgb = cv2.cvtColor(face_resized, cv2.COLOR_BGR2RGB)
-            face_normalized = face_rgb.astype(np.float32) / 255.0
+            face_normalized = np.multiply(face_rgb, np.float32(1.0 / 255.0), dtype=np.float32)
             
             return face_normalized
             
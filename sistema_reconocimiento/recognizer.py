@@ -29,26 +29,31 @@ class FaceRecognizer:
         try:
             # Buscar coincidencia en la base de datos
             match_result = self.db.find_match(embedding, self.confidence_threshold)
-            
-            if match_result:
-                nombre, confianza = match_result
-                
-                # Verificar si es un reconocimiento nuevo
-                is_new_recognition = self._is_new_recognition(nombre, face_bbox, confianza)
-                
-                if is_new_recognition:
-                    # Guardar log de reconocimiento
-                    self._save_recognition_log(nombre, confianza, embedding, face_bbox)
-                
-                return nombre, confianza, is_new_recognition
-            else:
-                # Rostro desconocido
-                return None, 0.0, False
+            return self._handle_match(match_result, embedding, face_bbox)
                 
         except Exception as e:
             logger.error(f"Error en reconocimiento facial: {e}")
             return None, 0.0, False
     
+    def _handle_match(self, match_result: Optional[Tuple[str, float]], embedding: np.ndarray,
+                      face_bbox: Tuple[int, int, int, int]) -> Tuple[Optional[str], float, bool]:
+        """Convierte el resultado de la búsqueda en (nombre, confianza, es_nuevo)
+        y guarda el log si el reconocimiento es nuevo"""
+        if match_result:
+            nombre, confianza = match_result
+            
+            # Verificar si es un reconocimiento nuevo
+            is_new_recognition = self._is_new_recognition(nombre, face_bbox, confianza)
+            
+            if is_new_recognition:
+                # Guardar log de reconocimiento
+                self._save_recognition_log(nombre, confianza, embedding, face_bbox)
+            
+            return nombre, confianza, is_new_recognition
+        else:
+            # Rostro desconocido
+            return None, 0.0, False
+    
     def _is_new_recognition(self, nombre: str, face_bbox: Tuple[int, int, int, int], confianza: float) -> bool:
         """
         Determina si un reconocimiento es nuevo (no repetido recientemente)
@@ -69,13 +74,12 @@ class FaceRecognizer:
             # Verificar si el rostro está en la misma posición
             for rec in recent_recognitions:
                 rec_center = rec['bbox_center']
-                distance = np.sqrt(
-                    (bbox_center[0] - rec_center[0])**2 + 
-                    (bbox_center[1] - rec_center[1])**2
-                )
+                dx = bbox_center[0] - rec_center[0]
+                dy = bbox_center[1] - rec_center[1]
                 
                 # Si está muy cerca, considerar el mismo reconocimiento
-                if distance < 50:  # 50 píxeles
+                # (distancia al cuadrado, sin raíz: 50 píxeles)
+                if dx * dx + dy * dy < 50 * 50:
                     return False
         
         # Agregar a historial
@@ -137,9 +141,19 @@ class FaceRecognizer:
             Lista de tuplas (nombre, confianza, es_nuevo, bbox)
         """
         results = []
-        
-        for embedding, bbox in face_data:
-            nombre, confianza, es_nuevo = self.recognize_face(embedding, bbox)
+        if not face_data:
+            return results
+        
+        # Una sola búsqueda en la base de datos para todos los rostros
+        embeddings = [embedding for embedding, _ in face_data]
+        matches = self.db.find_matches(embeddings, self.confidence_threshold)
+        
+        for (embedding, bbox), match_result in zip(face_data, matches):
+            try:
+                nombre, confianza, es_nuevo = self._handle_match(match_result, embedding, bbox)
+            except Exception as e:
+                logger.error(f"Error en reconocimiento facial: {e}")
+                nombre, confianza, es_nuevo = None, 0.0, False
             results.append((nombre, confianza, es_nuevo, bbox))
         
         return results
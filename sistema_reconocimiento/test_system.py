@@ -65,6 +65,22 @@ def test_database():
             print("  ✗ Error en búsqueda")
             return False
         
+        # Dos personas distintas pero muy parecidas (coseno > 0.95, como
+        # dan los embeddings casi todos positivos): cada una se encuentra a sí
+        # misma aunque se consulten una detrás de otra
+        rng = np.random.default_rng(0)
+        close_a = rng.random(128).astype(np.float32)
+        close_b = (0.8 * close_a + 0.2 * rng.random(128)).astype(np.float32)
+        db.add_person("CloseA", close_a)
+        db.add_person("CloseB", close_b)
+        match_a = db.find_match(close_a)
+        match_b = db.find_match(close_b)
+        if match_a and match_a[0] == "CloseA" and match_b and match_b[0] == "CloseB":
+            print("  ✓ Personas parecidas distinguidas")
+        else:
+            print(f"  ✗ Personas parecidas confundidas: {match_a}, {match_b}")
+            return False
+        
         # Probar listado
         people = db.list_people()
         if len(people) > 0:
@@ -75,7 +91,10 @@ def test_database():
         
         # Limpiar
         import os
-        os.remove("test.db")
+        db.close()
+        for path in ("test.db", "test_embeddings.npy", "test_embeddings_key.npy"):
+            if os.path.exists(path):
+                os.remove(path)
         print("  ✓ Base de datos limpiada")
         
         return True
@@ -110,7 +129,10 @@ def test_recognizer():
         
         # Limpiar
         import os
-        os.remove("test_recognizer.db")
+        db.close()
+        for path in ("test_recognizer.db", "test_recognizer_embeddings.npy", "test_recognizer_embeddings_key.npy"):
+            if os.path.exists(path):
+                os.remove(path)
         print("  ✓ Base de datos limpiada")
         
         return True
@@ -257,7 +279,10 @@ def test_performance():
         
         # Limpiar
         import os
-        os.remove("test_performance.db")
+        db.close()
+        for path in ("test_performance.db", "test_performance_embeddings.npy", "test_performance_embeddings_key.npy"):
+            if os.path.exists(path):
+                os.remove(path)
         
         return True
         
@@ -265,6 +290,100 @@ def test_performance():
         print(f"  ✗ Error en prueba de rendimiento: {e}")
         return False
 
+def test_gallery_file():
+    """Prueba la galería guardada en .npy junto a la base"""
+    print("\n💾 Probando galería en .npy...")
+    
+    try:
+        import os
+        from face_db import FaceDatabase
+        
+        sidecars = ("test_gallery_embeddings.npy", "test_gallery_embeddings_key.npy")
+        
+        def remove_db():
+            for path in ("test_gallery.db", "test_gallery.db-wal", "test_gallery.db-shm"):
+                if os.path.exists(path):
+                    os.remove(path)
+        
+        rng = np.random.default_rng(1)
+        alice = rng.standard_normal(128).astype(np.float32)
+        bob = rng.standard_normal(128).astype(np.float32)
+        
+        # Al reabrir la base la galería se mapea desde el .npy
+        db = FaceDatabase("test_gallery.db")
+        db.add_person("Alice", alice)
+        db.find_match(alice)
+        db.close()
+        db = FaceDatabase("test_gallery.db")
+        match = db.find_match(alice)
+        if match and match[0] == "Alice" and isinstance(db._gallery[1], np.memmap):
+            print("  ✓ Galería mapeada al reabrir")
+        else:
+            print(f"  ✗ Error al reabrir la galería: {match}")
+            return False
+        db.close()
+        
+        # Base borrada y creada de nuevo: los ids se reinician, pero el .npy
+        # de la base anterior no debe usarse
+        remove_db()
+        db = FaceDatabase("test_gallery.db")
+        db.add_person("Bob", bob)
+        match_alice = db.find_match(alice)
+        match_bob = db.find_match(bob)
+        db.close()
+        if match_alice is None and match_bob and match_bob[0] == "Bob":
+            print("  ✓ Galería de otra base descartada")
+        else:
+            print(f"  ✗ Galería de otra base usada: {match_alice}, {match_bob}")
+            return False
+        
+        # Limpiar
+        remove_db()
+        for path in sidecars:
+            if os.path.exists(path):
+                os.remove(path)
+        
+        return True
+        
+    except Exception as e:
+        print(f"  ✗ Error en galería .npy: {e}")
+        return False
+
+def test_fast_match():
+    """Compara el kernel JIT de búsqueda por lotes con la versión NumPy"""
+    print("\n⚡ Probando búsqueda por lotes...")
+    
+    try:
+        import fast_match
+        
+        if fast_match.numba is None:
+            print("  ⚠️ numba no instalado, se omite la comparación del kernel")
+            return True
+        
+        # Galería int8 positiva (como los embeddings reales) y una consulta
+        # negativa, con todas sus similitudes por debajo de cero
+        rng = np.random.default_rng(0)
+        gallery = rng.integers(1, 128, (300, 128)).astype(np.int8)
+        queries = np.stack([gallery[5], gallery[42], -rng.integers(1, 128, 128)]).astype(np.int8)
+        norms = np.sqrt(np.einsum('ij,ij->i', gallery, gallery, dtype=np.int32))
+        inv_norms = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+        query_norms = np.sqrt(np.einsum('ij,ij->i', queries, queries, dtype=np.int32))
+        
+        expected_ids, expected_scores = fast_match._batch_match_numpy(queries, gallery, inv_norms, query_norms)
+        ids, scores = fast_match.batch_match(queries, gallery, inv_norms, query_norms)
+        
+        if np.array_equal(ids, expected_ids) and np.allclose(scores, expected_scores, atol=1e-5):
+            print("  ✓ Kernel JIT coincide con NumPy")
+        else:
+            print(f"  ✗ Kernel JIT difiere: {ids} {scores} vs {expected_ids} {expected_scores}")
+            return False
+        
+        return True
+        
+    except Exception as e:
+        print(f"  ✗ Error en búsqueda por lotes: {e}")
+        return False
+
 def run_all_tests():
     """Ejecuta todas las pruebas"""
     print("🚀 INICIANDO PRUEBAS DEL SISTEMA DE RECONOCIMIENTO FACIAL")
@@ -277,7 +396,9 @@ def run_all_tests():
         ("Manejador de Cámara", test_camera_handler),
         ("Utilidades", test_utils),
         ("Aplicación Web", test_webapp),
-        ("Rendimiento", test_performance)
+        ("Rendimiento", test_performance),
+        ("Galería en .npy", test_gallery_file),
+        ("Búsqueda por lotes", test_fast_match)
     ]
     
     passed = 0
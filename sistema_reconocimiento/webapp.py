@@ -78,12 +78,15 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Limpia recursos al cerrar"""
-    global camera_handler
+    global camera_handler, face_db
     
     if camera_handler:
         camera_handler.stop()
         logger.info("Cámara detenida")
         log_system_event("INFO", "Sistema detenido")
+    
+    if face_db:
+        face_db.close()
 
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
@@ -216,10 +219,12 @@ async def register_person_via_camera(name: str = Form(...)):
         if not camera_handler.is_running:
             raise HTTPException(status_code=500, detail="Cámara no disponible")
         
-        # Obtener frame actual de la cámara
+        # Obtener frame actual de la cámara (copia propia: el registro tarda
+        # más que una vuelta del buffer circular de captura)
         frame = camera_handler.get_current_frame()
         if frame is None:
             raise HTTPException(status_code=500, detail="No se pudo capturar frame de la cámara")
+        frame = frame.copy()
         
         # Detectar rostros en el frame
         faces = camera_handler._detect_faces(frame)
@@ -233,13 +238,12 @@ async def register_person_via_camera(name: str = Form(...)):
         # Extraer región del rostro
         face_roi = frame[y:y+h, x:x+w]
         
-        # Generar embedding "desde la cámara" (simulado)
-        face_resized = cv2.resize(face_roi, (128, 128))
-        face_gray = cv2.cvtColor(face_resized, cv2.COLOR_BGR2GRAY)
-        face_normalized = face_gray.astype(np.float32) / 255.0
+        # Generar embedding "desde la cámara" (simulado), con el mismo
+        # preprocesamiento que el reconocimiento en vivo
+        face_gray, face_normalized = camera_handler._prepare_face(face_roi)
         
         # Generar embedding usando el método de la cámara
-        embedding = camera_handler._simulate_camera_embedding(face_normalized)
+        embedding = camera_handler._simulate_camera_embedding(face_normalized, face_gray)
         
         # Validar embedding
         if not face_recognizer.validate_embedding(embedding):